@@ -2,17 +2,29 @@ from django.contrib import admin
 from django.utils.html import format_html
 
 from .models import (
+    DataVersion,
     Genre,
+    LLMResponse,
     Playlist,
     PlaylistGenre,
+    PlaylistMembership,
     PlaylistSong,
+    PlaylistSource,
+    QuotaUsage,
+    ScanCheckpoint,
     Song,
+    SongAlias,
 )
 
+admin.site.register(DataVersion)
 admin.site.register(Genre)
+admin.site.register(LLMResponse)
 admin.site.register(PlaylistGenre)
+admin.site.register(PlaylistMembership)
 admin.site.register(PlaylistSong)
+admin.site.register(ScanCheckpoint)
 admin.site.register(Song)
+admin.site.register(SongAlias)
 
 
 @admin.register(Playlist)
@@ -25,7 +37,7 @@ class PlaylistAdmin(admin.ModelAdmin):
         "position",
         "is_favorite",
     )
-    list_filter = ("is_favorite", "published_at")
+    list_filter = ("is_favorite", "published_at", "removed_at")
     search_fields = ("title",)
     actions = ["mark_as_favorite", "remove_from_favorites"]
     list_editable = ["is_favorite"]
@@ -44,12 +56,14 @@ class PlaylistAdmin(admin.ModelAdmin):
     def mark_as_favorite(self, request, queryset):
         """Action to mark selected items as favorite"""
         queryset.update(is_favorite=True)
+        DataVersion.objects.bump()
 
     mark_as_favorite.short_description = "Mark selected items as favorite"
 
     def remove_from_favorites(self, request, queryset):
         """Action to remove selected items from favorites"""
         queryset.update(is_favorite=False)
+        DataVersion.objects.bump()
 
     remove_from_favorites.short_description = "Remove selected items from favorites"
 
@@ -60,3 +74,26 @@ class PlaylistAdmin(admin.ModelAdmin):
         )
 
         return queryset, True
+
+
+@admin.register(PlaylistSource)
+class PlaylistSourceAdmin(admin.ModelAdmin):
+    list_display = (
+        "playlist_id",
+        "title",
+        "is_active",
+        "last_scanned_at",
+        "last_full_scan_at",
+        "item_count",
+        "last_error",
+    )
+    list_filter = ("is_active",)
+    list_editable = ["is_active"]
+    search_fields = ("playlist_id", "title")
+
+
+@admin.register(QuotaUsage)
+class QuotaUsageAdmin(admin.ModelAdmin):
+    list_display = ("day", "endpoint", "units", "calls", "updated_at")
+    list_filter = ("endpoint",)
+    date_hierarchy = "day"
@@ -0,0 +1,83 @@
+import functools
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+from django.db import connection
+
+
+@dataclass
+class StageStats:
+    seconds: float = 0.0
+    queries: int = 0
+    peak_mib: float = 0.0
+
+
+@dataclass
+class MethodStats:
+    calls: int = 0
+    seconds: float = 0.0
+    queries: int = 0
+
+
+@dataclass
+class Profiler:
+    """Collects wall time, query count and peak memory per stage and method."""
+
+    track_memory: bool = True
+    stages: dict = field(default_factory=dict)
+    methods: dict = field(default_factory=dict)
+    queries: int = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def stage(self, name: str):
+        if self.track_memory:
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+        queries = self.queries
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(self):
+                yield
+        finally:
+            peak = 0
+            if self.track_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            self.stages[name] = StageStats(
+                seconds=time.perf_counter() - start,
+                queries=self.queries - queries,
+                peak_mib=peak / 1024 / 1024,
+            )
+
+    def instrument(self, obj, names: list[str]):
+        for name in names:
+            if hasattr(obj, name):
+                setattr(obj, name, self.wrap(name, getattr(obj, name)))
+
+    def wrap(self, name: str, method):
+        stats = self.methods.setdefault(name, MethodStats())
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            queries = self.queries
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                stats.calls += 1
+                stats.seconds += time.perf_counter() - start
+                stats.queries += self.queries - queries
+
+        return wrapper
+
+    def as_dict(self) -> dict:
+        return {
+            "stages": {name: asdict(stats) for name, stats in self.stages.items()},
+            "methods": {name: asdict(stats) for name, stats in self.methods.items()},
+        }
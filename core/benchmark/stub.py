@@ -0,0 +1,167 @@
+import asyncio
+import copy
+import hashlib
+import json
+import re
+import time
+from pathlib import Path
+
+import httpx
+
+RESPONSES_DIR = Path(__file__).resolve().parent / "responses"
+
+
+class StubApi:
+    """
+    Replays recorded YouTube Data API and OpenRouter responses for a
+    synthetic playlist of ``videos`` items. Each recorded response in
+    ``responses_dir`` is used as a template and its items are rewritten
+    per video, so the shapes match the real APIs at any scale.
+    """
+
+    PAGE_SIZE = 50
+    TRACKS_PER_VIDEO = 8
+
+    def __init__(
+        self,
+        videos: int,
+        clean_share: float = 0.5,
+        comment_share: float = 0.3,
+        responses_dir: Path = RESPONSES_DIR,
+    ):
+        self.videos = videos
+        self.clean_share = clean_share
+        self.comment_share = comment_share
+        self.song_pool = max(50, videos // 2)
+        self.generation = 0
+        self.calls = {}
+        self.templates = {
+            name: json.loads((responses_dir / f"{name}.json").read_text("utf-8"))
+            for name in ("playlistItems", "videos", "commentThreads", "openrouter")
+        }
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        endpoint = request.url.path.rsplit("/", 1)[-1]
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+
+        if endpoint == "completions":
+            return httpx.Response(200, json=self.completion(request))
+
+        params = dict(request.url.params)
+        if endpoint == "playlistItems":
+            data = self.playlist_items(params.get("pageToken"))
+        elif endpoint == "videos":
+            data = self.video_details(params["id"].split(","))
+        elif endpoint == "commentThreads":
+            data = self.comment_threads(params["videoId"])
+        else:
+            return httpx.Response(404, json={"error": {"code": 404}})
+
+        data["etag"] = self.etag(endpoint, json.dumps(params, sort_keys=True))
+        if request.headers.get("If-None-Match") == data["etag"]:
+            return httpx.Response(304)
+        return httpx.Response(200, json=data)
+
+    def etag(self, *parts) -> str:
+        key = ":".join(map(str, (self.generation, *parts)))
+        return hashlib.sha1(key.encode()).hexdigest()[:27]
+
+    def video_id(self, index: int) -> str:
+        return f"v{index:010d}"
+
+    def is_clean(self, index: int) -> bool:
+        return index % 100 < self.clean_share * 100
+
+    def tracklist(self, index: int, separator: str = " - ") -> str:
+        lines = []
+        for track in range(self.TRACKS_PER_VIDEO):
+            song = (index * 7 + track * 13) % self.song_pool
+            minutes = track * 3
+            lines.append(
+                f"{minutes:02d}:{track * 7 % 60:02d} Artist {song % 97}{separator}Song {song}"
+            )
+        return "\n".join(lines)
+
+    def playlist_items(self, page_token: str) -> dict:
+        start = int(page_token.removeprefix("PAGE")) if page_token else 0
+        end = min(start + self.PAGE_SIZE, self.videos)
+
+        data = copy.deepcopy(self.templates["playlistItems"])
+        template = data["items"][0]
+        data["items"] = []
+        for index in range(start, end):
+            item = copy.deepcopy(template)
+            snippet = item["snippet"]
+            snippet["title"] = f"{snippet['title']} #{index}"
+            snippet["description"] = (
+                f"Tracklist:\n{self.tracklist(index)}\n\n#lofi #chillhop"
+                if self.is_clean(index)
+                else f"Mix number {index}, songs in the comments. #lofi"
+            )
+            snippet["position"] = index
+            snippet["resourceId"]["videoId"] = self.video_id(index)
+            item["etag"] = self.etag("playlistItem", index)
+            data["items"].append(item)
+
+        data.pop("nextPageToken", None)
+        if end < self.videos:
+            data["nextPageToken"] = f"PAGE{end}"
+        data["pageInfo"]["totalResults"] = self.videos
+        return data
+
+    def video_details(self, video_ids: list[str]) -> dict:
+        data = copy.deepcopy(self.templates["videos"])
+        template = data["items"][0]
+        data["items"] = []
+        for video_id in video_ids:
+            item = copy.deepcopy(template)
+            item["id"] = video_id
+            item["etag"] = self.etag("video", video_id)
+            data["items"].append(item)
+        data["pageInfo"]["totalResults"] = len(video_ids)
+        return data
+
+    def comment_threads(self, video_id: str) -> dict:
+        data = copy.deepcopy(self.templates["commentThreads"])
+        index = int(video_id[1:])
+        if index % 100 >= self.comment_share * 100:
+            data["items"] = []
+            return data
+
+        thread = data["items"][0]
+        thread["snippet"]["videoId"] = video_id
+        comment = thread["snippet"]["topLevelComment"]["snippet"]
+        comment["videoId"] = video_id
+        comment["textOriginal"] = self.tracklist(index, separator=" – ")
+        return data
+
+    def completion(self, request: httpx.Request) -> dict:
+        data = copy.deepcopy(self.templates["openrouter"])
+        message = data["choices"][0]["message"]
+        extracted = json.loads(message["content"])
+
+        prompt = json.loads(request.content)["messages"][1]["content"]
+        video_ids = re.findall(r"video_id: (\S+)", prompt)
+        if video_ids:
+            extracted = {video_id: extracted for video_id in video_ids}
+
+        message["content"] = json.dumps(extracted)
+        return data
+
+
+class StubTransport(httpx.MockTransport):
+    """MockTransport that adds a fixed network ``latency`` (in seconds)."""
+
+    def __init__(self, api: StubApi, latency: float = 0.0):
+        super().__init__(api.handle)
+        self.latency = latency
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            time.sleep(self.latency)
+        return super().handle_request(request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await super().handle_async_request(request)
@@ -0,0 +1,141 @@
+import math
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Bracketed parts that describe the upload rather than the song
+NOISE = re.compile(
+    r"[\(\[][^\)\]]*\b(?:feat|ft|featuring|prod|official|video|audio|lyrics?|"
+    r"remaster(?:ed)?|hd|hq|visuali[sz]er|mv)\b[^\)\]]*[\)\]]",
+    re.IGNORECASE,
+)
+FEATURING = re.compile(r"\s(?:feat|ft|featuring)\b\.?\s.*$", re.IGNORECASE)
+ARTIST_SEPARATOR = re.compile(r"\s*(?:,|&|;|/|\band\b|\bx\b|\bvs\b\.?)\s*")
+SYMBOLS = re.compile(r"[\W_]+")
+NUMBERS = re.compile(r"\d+")
+
+# (pk, artist, title) of a song, the preferred canonical one of a group first
+SongRow = Tuple[int, Optional[str], Optional[str]]
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase words of ``text`` without accents, punctuation or credits."""
+    text = FEATURING.sub("", NOISE.sub(" ", text or ""))
+    text = unicodedata.normalize("NFKD", text.replace("&", " and "))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(SYMBOLS.sub(" ", text.lower()).split())
+
+
+def split_title(artist: Optional[str], title: Optional[str]) -> Tuple[str, str]:
+    """Splits "Artist - Title" titles, with or without the artist set apart."""
+    artist, title = artist or "", title or ""
+    left, dash, right = title.partition(" - ")
+    if dash and (not artist.strip() or normalize(left) == normalize(artist)):
+        return left, right
+    return artist, title
+
+
+def song_key(artist: Optional[str], title: Optional[str]) -> str:
+    """
+    Identity of a song regardless of casing, accents, credits and which of
+    the two fields the artist ended up in, so swaps share a key too.
+    """
+    artist, title = split_title(artist, title)
+    parts = sorted((normalize(artist), normalize(title)))
+    return " | ".join(parts) if any(parts) else ""
+
+
+def primary_artist(artist: Optional[str], title: Optional[str]) -> str:
+    """First credited artist, the block a song is compared within."""
+    artist, _ = split_title(artist, title)
+    return normalize(ARTIST_SEPARATOR.split(FEATURING.sub("", artist), 1)[0])
+
+
+def trigrams(text: str) -> Set[str]:
+    """Character trigrams of each padded word, like PostgreSQL's pg_trgm."""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+def duplicate_groups(
+    songs: Iterable[SongRow], threshold: float = 0.8
+) -> List[List[int]]:
+    """
+    Groups of songs that are the same track, as pks in the order they came
+    in. Songs with the same key always group; within each primary artist,
+    titles whose trigram similarity reaches ``threshold`` group as well,
+    unless their numbers differ ("Part 1" and "Part 2").
+    """
+    parent = {}
+
+    def find(pk: int) -> int:
+        while parent[pk] != pk:
+            parent[pk] = parent[parent[pk]]
+            pk = parent[pk]
+        return pk
+
+    def union(a: int, b: int):
+        a, b = find(a), find(b)
+        if a != b:
+            # The root is the song that came first, so it stays canonical
+            parent[max(a, b, key=order.get)] = min(a, b, key=order.get)
+
+    order, by_key, blocks = {}, {}, defaultdict(list)
+    for pk, artist, title in songs:
+        order[pk], parent[pk] = len(order), pk
+        key = song_key(artist, title)
+        if key:
+            union(pk, by_key.setdefault(key, pk))
+        block = primary_artist(artist, title)
+        blocks[block].append((pk, normalize(split_title(artist, title)[1])))
+
+    for rows in blocks.values():
+        for a, b in similar_pairs(rows, threshold):
+            union(a, b)
+
+    groups = defaultdict(list)
+    for pk in order:
+        groups[find(pk)].append(pk)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def similar_pairs(
+    rows: List[Tuple[int, str]], threshold: float
+) -> Iterable[Tuple[int, int]]:
+    """
+    Pairs of (pk, text) rows whose trigram similarity reaches ``threshold``.
+    Prefix filtering keeps it from comparing every pair: sets that similar
+    must share one of their rarest ``len - ceil(threshold * len) + 1``
+    trigrams, so only those are indexed and probed.
+    """
+    grams = {pk: trigrams(text) for pk, text in rows}
+    numbers = {pk: NUMBERS.findall(text) for pk, text in rows}
+    frequency: Dict[str, int] = defaultdict(int)
+    for pk_grams in grams.values():
+        for gram in pk_grams:
+            frequency[gram] += 1
+
+    index = defaultdict(list)
+    for pk, _ in sorted(rows, key=lambda row: len(grams[row[0]])):
+        ordered = sorted(grams[pk], key=lambda gram: (frequency[gram], gram))
+        prefix = ordered[: len(ordered) - math.ceil(threshold * len(ordered)) + 1]
+        candidates = {other for gram in prefix for other in index[gram]}
+        for other in candidates:
+            if (
+                numbers[pk] == numbers[other]
+                and similarity(grams[pk], grams[other]) >= threshold
+            ):
+                yield other, pk
+        for gram in prefix:
+            index[gram].append(pk)
@@ -0,0 +1,292 @@
+import asyncio
+import importlib.util
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger("fuminsho")
+
+# Statuses worth retrying; 429 is rate limiting, the rest are server faults
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Methods safe to send twice. Others, like an OpenRouter completion POST, are
+# only retried when the server can't have acted on them: on a 429, or on an
+# error raised before the request was sent
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+DEFAULT_LIMITS = httpx.Limits(
+    max_connections=20, max_keepalive_connections=10, keepalive_expiry=30
+)
+
+
+class CircuitOpen(httpx.HTTPError):
+    """Raised instead of sending a request to a host that keeps failing."""
+
+
+class CircuitBreaker:
+    """
+    Stops requests to a host after ``threshold`` failures in a row. After
+    ``cooldown`` seconds one request is let through to probe the host: it
+    closes the circuit if it succeeds and opens it again if it fails.
+    """
+
+    def __init__(self, host: str, threshold: int = 5, cooldown: float = 30.0):
+        self.host = host
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            # Half-open: this request probes the host, the others keep waiting
+            self.opened_at = time.monotonic()
+            return True
+
+    def record(self, success: bool):
+        with self.lock:
+            if success:
+                if self.opened_at is not None:
+                    logger.info(f"🔌 Circuit closed for {self.host}")
+                self.failures, self.opened_at = 0, None
+                return
+            self.failures += 1
+            if self.failures >= self.threshold:
+                if self.opened_at is None:
+                    logger.warning(
+                        f"🔌 Circuit open for {self.host} after {self.failures} failures"
+                    )
+                self.opened_at = time.monotonic()
+
+
+breakers: Dict[str, CircuitBreaker] = {}
+breakers_lock = threading.Lock()
+
+
+def circuit_breaker(host: str) -> CircuitBreaker:
+    """The breaker of ``host``, shared by every client in the process."""
+    with breakers_lock:
+        if host not in breakers:
+            breakers[host] = CircuitBreaker(host)
+        return breakers[host]
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int = 4
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+    # Longer Retry-After waits are capped, the caller gives up instead
+    max_retry_after: float = 120.0
+
+    def delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = parse_retry_after(response)
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        # Full jitter, so parallel workers don't retry in lockstep
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+
+def parse_retry_after(response: Optional[httpx.Response]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, in seconds or as an HTTP date."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((date - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def http2_enabled(http2: bool) -> bool:
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("⚠️ HTTP/2 needs the h2 package (httpx[http2]), using HTTP/1.1")
+        return False
+    return http2
+
+
+class BaseApiClient:
+    def __init__(self, retry: Optional[RetryPolicy] = None):
+        self.retry = retry or RetryPolicy()
+
+    def breaker(self, url) -> CircuitBreaker:
+        breaker = circuit_breaker(httpx.URL(url).host)
+        if not breaker.allow():
+            raise CircuitOpen(f"Circuit open for {breaker.host}, not sending request")
+        return breaker
+
+    def should_retry(
+        self,
+        breaker: CircuitBreaker,
+        method: str,
+        attempt: int,
+        response: Optional[httpx.Response],
+        error: Optional[httpx.TransportError],
+    ) -> bool:
+        # A 429 means the host is healthy but wants us to slow down
+        server_fault = error is not None or response.status_code >= 500
+        breaker.record(not server_fault)
+        if attempt + 1 >= self.retry.attempts:
+            return False
+        if method.upper() not in IDEMPOTENT_METHODS:
+            if error is not None:
+                return isinstance(error, UNSENT_ERRORS)
+            return response.status_code == 429
+        return error is not None or response.status_code in RETRY_STATUSES
+
+    def log_retry(self, method: str, url, delay: float, response, error):
+        reason = error or f"status {response.status_code}"
+        logger.warning(
+            f"🔁 Retrying {method} {httpx.URL(url).host} in {delay:.1f}s after {reason}"
+        )
+
+
+class ApiClient(BaseApiClient):
+    """
+    ``httpx.Client`` with pooled connections, optional HTTP/2, and retries
+    with jittered exponential backoff (or the server's Retry-After) on 429,
+    5xx and transport errors (see IDEMPOTENT_METHODS for POSTs). Hosts that
+    keep failing get their circuit opened so workers stop hammering them.
+    Once the retries are spent the last response is returned, or the last
+    transport error raised. ``on_attempt`` is called before every attempt,
+    e.g. to bill each one against a quota.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 60,
+        limits: Optional[httpx.Limits] = None,
+        http2: bool = False,
+        retry: Optional[RetryPolicy] = None,
+        transport: Optional[httpx.BaseTransport] = None,
+    ):
+        super().__init__(retry)
+        self.client = httpx.Client(
+            timeout=timeout,
+            limits=limits or DEFAULT_LIMITS,
+            http2=http2_enabled(http2),
+            transport=transport,
+        )
+
+    def request(
+        self,
+        method: str,
+        url,
+        on_attempt: Optional[Callable[[], None]] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        attempt = 0
+        while True:
+            breaker = self.breaker(url)
+            if on_attempt:
+                on_attempt()
+            response, error = None, None
+            try:
+                response = self.client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                error = e
+            if not self.should_retry(breaker, method, attempt, response, error):
+                if error is not None:
+                    raise error
+                return response
+            delay = self.retry.delay(attempt, response)
+            self.log_retry(method, url, delay, response, error)
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url, **kwargs) -> httpx.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs) -> httpx.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class AsyncApiClient(BaseApiClient):
+    """ApiClient over ``httpx.AsyncClient``, for use inside one event loop."""
+
+    def __init__(
+        self,
+        timeout: float = 60,
+        limits: Optional[httpx.Limits] = None,
+        http2: bool = False,
+        retry: Optional[RetryPolicy] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        super().__init__(retry)
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=limits or DEFAULT_LIMITS,
+            http2=http2_enabled(http2),
+            transport=transport,
+        )
+
+    async def request(
+        self,
+        method: str,
+        url,
+        on_attempt: Optional[Callable[[], None]] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        attempt = 0
+        while True:
+            breaker = self.breaker(url)
+            if on_attempt:
+                on_attempt()
+            response, error = None, None
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                error = e
+            if not self.should_retry(breaker, method, attempt, response, error):
+                if error is not None:
+                    raise error
+                return response
+            delay = self.retry.delay(attempt, response)
+            self.log_retry(method, url, delay, response, error)
+            if response is not None:
+                await response.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get(self, url, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
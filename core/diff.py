@@ -0,0 +1,93 @@
+import bisect
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Iterable, List, Tuple
+
+# (video_id, position, etag) of one playlist item
+Entry = Tuple[str, int, str]
+
+
+@dataclass(frozen=True)
+class PlaylistDiff:
+    inserted: List[str]
+    removed: List[str]
+    # Items whose order relative to the others changed, not the ones that
+    # only shifted because of an insert or removal above them
+    moved: List[str]
+    # Same item, new etag: its title, description or thumbnails were edited
+    updated: List[str]
+
+    def __bool__(self):
+        return bool(self.inserted or self.removed or self.moved or self.updated)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.inserted)} inserted, {len(self.removed)} removed, "
+            f"{len(self.moved)} moved, {len(self.updated)} updated"
+        )
+
+
+def page_entries(data: dict) -> List[Entry]:
+    """Entries of a playlistItems response, deleted and private videos included."""
+    return [
+        (
+            item["snippet"]["resourceId"]["videoId"],
+            item["snippet"]["position"],
+            item.get("etag", ""),
+        )
+        for item in data.get("items", [])
+    ]
+
+
+def fingerprint(entries: Iterable[Entry]) -> str:
+    # Entries read back from a JSONField are lists, which serialize the same
+    data = json.dumps([list(entry) for entry in entries])
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def diff(old: Iterable[Entry], new: Iterable[Entry]) -> PlaylistDiff:
+    old_items = {video_id: (position, etag) for video_id, position, etag in old}
+    new_items = {video_id: (position, etag) for video_id, position, etag in new}
+
+    kept = sorted(
+        (position, video_id)
+        for video_id, (position, _) in new_items.items()
+        if video_id in old_items
+    )
+    in_order = set(longest_increasing([(old_items[v][0], v) for _, v in kept]))
+    return PlaylistDiff(
+        inserted=[v for v in new_items if v not in old_items],
+        removed=[v for v in old_items if v not in new_items],
+        moved=[video_id for _, video_id in kept if video_id not in in_order],
+        updated=[
+            video_id
+            for _, video_id in kept
+            if old_items[video_id][1] != new_items[video_id][1]
+        ],
+    )
+
+
+def longest_increasing(items: List[Tuple[int, str]]) -> List[str]:
+    """
+    Video ids of the longest subsequence of (old position, video id) pairs,
+    in their new order, whose old positions still increase: the largest set
+    that kept its order, so the rest is the fewest moves that explain it.
+    """
+    tails, tail_indexes, previous = [], [], [None] * len(items)
+    for index, (key, _) in enumerate(items):
+        slot = bisect.bisect_left(tails, key)
+        if slot == len(tails):
+            tails.append(key)
+            tail_indexes.append(index)
+        else:
+            tails[slot] = key
+            tail_indexes[slot] = index
+        previous[index] = tail_indexes[slot - 1] if slot else None
+
+    run = []
+    index = tail_indexes[-1] if tail_indexes else None
+    while index is not None:
+        run.append(items[index][1])
+        index = previous[index]
+    return run
@@ -0,0 +1,226 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Tuple
+
+import brotli
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from core.models import Genre, Playlist, PlaylistGenre, PlaylistSong, Song
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".manifest.json"
+
+
+@dataclass
+class ExportStats:
+    written: int = 0
+    skipped: int = 0
+    removed: int = 0
+    bytes: int = 0
+    paths: list = field(default_factory=list)
+
+
+class SiteExporter:
+    """
+    Renders every public page to ``output_dir`` as ``<path>/index.html`` with
+    ``.gz`` and ``.br`` siblings, so a static file server can serve the site.
+
+    Each page has a fingerprint of the rows it renders. The fingerprints of
+    the last export are kept in a manifest, and pages whose fingerprint is
+    unchanged are neither rendered nor written again.
+    """
+
+    def __init__(self, output_dir: Path, host: str = "localhost", secure=True):
+        self.output_dir = Path(output_dir)
+        self.factory = RequestFactory(HTTP_HOST=host, secure=secure)
+
+    def export(self, force: bool = False) -> ExportStats:
+        manifest_path = self.output_dir / MANIFEST_NAME
+        previous = {}
+        if manifest_path.exists() and not force:
+            previous = json.loads(manifest_path.read_text("utf-8"))
+
+        stats = ExportStats()
+        current = {}
+        for path, fingerprint in self.fingerprints():
+            current[path] = fingerprint
+            target = self.target(path)
+            if previous.get(path) == fingerprint and target.exists():
+                stats.skipped += 1
+                continue
+            stats.bytes += self.write(target, self.render(path))
+            stats.written += 1
+            stats.paths.append(path)
+
+        for path in previous.keys() - current.keys():
+            self.remove(self.target(path))
+            stats.removed += 1
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path.write_text(json.dumps(current, sort_keys=True), "utf-8")
+        logger.info(
+            f"📦 Exported {stats.written} pages, skipped {stats.skipped} unchanged "
+            f"and removed {stats.removed}"
+        )
+        return stats
+
+    def fingerprints(self) -> Iterator[Tuple[str, str]]:
+        """Yields (path, fingerprint) for every page of the site."""
+        playlists = self.playlist_fingerprints()
+        songs = {
+            pk: (slug, title, artist)
+            for pk, slug, title, artist in Song.objects.exclude(slug="")
+            .values_list("pk", "slug", "title", "artist")
+            .iterator()
+        }
+        genres = dict(Genre.objects.exclude(slug="").values_list("pk", "name"))
+        genre_slugs = dict(Genre.objects.exclude(slug="").values_list("pk", "slug"))
+
+        playlists_page = digest_rows(sorted(playlists.items()))
+        yield reverse("index"), digest(len(songs), len(genres), playlists_page)
+        yield reverse("playlists"), playlists_page
+        yield reverse("songs"), digest_rows(
+            Song.objects.order_by("-playlist_count", "pk")
+            .values_list("slug", "title", "artist", "playlist_count")
+            .iterator()
+        )
+        yield reverse("genres"), digest_rows(
+            Genre.objects.order_by("-playlist_count", "pk")
+            .values_list("slug", "name", "playlist_count")
+            .iterator()
+        )
+
+        for model, key, rows, slugs in (
+            (PlaylistSong, "song_id", songs, {pk: row[0] for pk, row in songs.items()}),
+            (PlaylistGenre, "genre_id", genres, genre_slugs),
+        ):
+            name = key.removesuffix("_id")
+            unlinked = set(rows)
+            for pk, playlist_ids in self.grouped_links(model, key):
+                if pk in rows:
+                    unlinked.discard(pk)
+                    yield reverse(name, args=[slugs[pk]]), digest(
+                        rows[pk],
+                        *(
+                            playlists[playlist_id]
+                            for playlist_id in playlist_ids
+                            if playlist_id in playlists
+                        ),
+                    )
+            for pk in unlinked:
+                yield reverse(name, args=[slugs[pk]]), digest(rows[pk])
+
+    def playlist_fingerprints(self) -> Dict[int, str]:
+        """
+        One fingerprint per playlist, from the columns the pages show and
+        those of its song and genre links, joined songs and genres included,
+        so renaming a song or genre changes the pages that list it.
+        """
+        links = {}
+        for rows in (
+            PlaylistSong.objects.order_by("playlist_id", "track_index", "pk")
+            .values_list(
+                "playlist_id",
+                "song__slug",
+                "song__title",
+                "song__artist",
+                "position",
+                "offset_seconds",
+            )
+            .iterator(chunk_size=10_000),
+            PlaylistGenre.objects.order_by("playlist_id", "pk")
+            .values_list("playlist_id", "genre__slug", "genre__name")
+            .iterator(chunk_size=10_000),
+        ):
+            for playlist_id, *columns in rows:
+                if playlist_id not in links:
+                    links[playlist_id] = hashlib.sha256()
+                links[playlist_id].update(repr(columns).encode())
+
+        rows = (
+            Playlist.objects.listed()
+            .order_by("pk")
+            .values_list(
+                "pk",
+                "video_id",
+                "title",
+                "thumbnails",
+                "position",
+                "duration",
+                "published_at",
+                "is_favorite",
+            )
+        )
+        return {
+            row[0]: digest(*row, links[row[0]].hexdigest() if row[0] in links else "")
+            for row in rows.iterator()
+        }
+
+    def grouped_links(self, model, key: str) -> Iterator[Tuple[int, list]]:
+        """Streams (key, [playlist ids]) groups without loading the link table."""
+        rows = (
+            model.objects.order_by(key, "playlist_id")
+            .values_list(key, "playlist_id")
+            .iterator(chunk_size=10_000)
+        )
+        current, playlist_ids = None, []
+        for value, playlist_id in rows:
+            if value != current and playlist_ids:
+                yield current, playlist_ids
+                playlist_ids = []
+            current = value
+            playlist_ids.append(playlist_id)
+        if playlist_ids:
+            yield current, playlist_ids
+
+    def render(self, path: str) -> bytes:
+        match = resolve(path)
+        initkwargs = {**match.func.view_initkwargs, "cache_pages": False}
+        if path == reverse("playlists"):
+            # No lazy loading without a server, so render every row at once
+            initkwargs["page_size"] = max(Playlist.objects.listed().count(), 1)
+        view = match.func.view_class.as_view(**initkwargs)
+        response = view(self.factory.get(path), *match.args, **match.kwargs)
+        return response.content
+
+    def target(self, path: str) -> Path:
+        return self.output_dir / path.strip("/") / "index.html"
+
+    def write(self, target: Path, content: bytes) -> int:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        for suffix, data in (
+            ("", content),
+            (".gz", gzip.compress(content, compresslevel=9, mtime=0)),
+            (".br", brotli.compress(content, mode=brotli.MODE_TEXT)),
+        ):
+            temporary = target.with_name(f".{target.name}{suffix}.tmp")
+            temporary.write_bytes(data)
+            os.replace(temporary, target.with_name(target.name + suffix))
+        return len(content)
+
+    def remove(self, target: Path):
+        for suffix in ("", ".gz", ".br"):
+            target.with_name(target.name + suffix).unlink(missing_ok=True)
+        try:
+            target.parent.rmdir()
+        except OSError:
+            pass
+
+
+def digest(*parts) -> str:
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+
+def digest_rows(rows: Iterable) -> str:
+    """Like digest(), but streams the rows instead of joining them in memory."""
+    hasher = hashlib.sha256()
+    for row in rows:
+        hasher.update(repr(row).encode())
+    return hasher.hexdigest()[:32]
@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+from django import forms
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from core.logs import CURSOR_PATTERN, LEVELS, TIME_FORMAT
+
+
+class PlaylistFilterForm(forms.Form):
+    SORT_CHOICES = [
+        ("position", "Position"),
+        ("-position", "Position (descending)"),
+        ("duration", "Duration"),
+        ("-duration", "Duration (descending)"),
+        ("published_at", "Published at"),
+        ("-published_at", "Published at (descending)"),
+    ]
+    DURATION_CHOICES = [
+        ("", "Any length"),
+        ("short", "Under 30 minutes"),
+        ("medium", "30 to 60 minutes"),
+        ("long", "1 to 2 hours"),
+        ("extended", "Over 2 hours"),
+    ]
+    # Minutes, lower bound inclusive and upper bound exclusive
+    DURATION_RANGES = {
+        "short": (None, 30),
+        "medium": (30, 60),
+        "long": (60, 120),
+        "extended": (120, None),
+    }
+
+    sort = forms.ChoiceField(choices=SORT_CHOICES, required=False)
+    q = forms.CharField(max_length=200, required=False)
+    genre = forms.SlugField(max_length=100, required=False)
+    favorite = forms.BooleanField(required=False)
+    duration = forms.ChoiceField(choices=DURATION_CHOICES, required=False)
+    published_after = forms.DateField(required=False)
+    published_before = forms.DateField(required=False)
+    cursor = forms.CharField(max_length=500, required=False)
+
+    def filter(self, queryset: QuerySet) -> QuerySet:
+        """Applies the valid filters; invalid ones are ignored."""
+        self.is_valid()
+        data = self.cleaned_data
+
+        if data.get("q"):
+            queryset = queryset.filter(title__icontains=data["q"])
+        if data.get("genre"):
+            queryset = queryset.filter(genres__slug=data["genre"])
+        if data.get("favorite"):
+            queryset = queryset.filter(is_favorite=True)
+        if data.get("duration"):
+            shortest, longest = self.DURATION_RANGES[data["duration"]]
+            if shortest is not None:
+                queryset = queryset.filter(duration__gte=timedelta(minutes=shortest))
+            if longest is not None:
+                queryset = queryset.filter(duration__lt=timedelta(minutes=longest))
+        if data.get("published_after"):
+            queryset = queryset.filter(published_at__date__gte=data["published_after"])
+        if data.get("published_before"):
+            queryset = queryset.filter(published_at__date__lte=data["published_before"])
+        return queryset
+
+    @property
+    def ordering(self) -> str:
+        return self.cleaned_data.get("sort") or "position"
+
+
+class LogFilterForm(forms.Form):
+    level = forms.ChoiceField(
+        choices=[("", "All levels")] + [(level, level.title()) for level in LEVELS],
+        required=False,
+    )
+    since = forms.DateTimeField(required=False)
+    until = forms.DateTimeField(required=False)
+    before = forms.RegexField(CURSOR_PATTERN, required=False)
+    limit = forms.IntegerField(min_value=1, max_value=2000, required=False)
+    stream = forms.BooleanField(required=False)
+
+    def clean(self):
+        data = super().clean()
+        # Log lines carry local, naive timestamps that compare as strings
+        for name in ("since", "until"):
+            if data.get(name):
+                data[name] = timezone.localtime(data[name]).strftime(TIME_FORMAT)
+        return data
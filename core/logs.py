@@ -0,0 +1,642 @@
+import gzip
+import json
+import logging.handlers
+import os
+import re
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows, where writes and rotations go unlocked
+    fcntl = None
+
+LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# The start of every line written by JSONFormatter, which keeps this key
+# order. Lines that don't match, e.g. from an older log format, are shown as
+# they are, as part of the record before them.
+RECORD_PATTERN = re.compile(
+    rb'^\{"time": "(?P<time>[0-9: -]+)", '
+    rb'"level": "(?P<level>DEBUG|INFO|WARNING|ERROR|CRITICAL)"',
+    re.MULTILINE,
+)
+CURSOR_PATTERN = re.compile(r"^(\d+):(\d+)$")
+BLOCK_SIZE = 64 * 1024
+READ_SIZE = 1024 * 1024
+# Records at or above this level get their own offsets in the index...
+NOTABLE_LEVEL = LEVELS.index("WARNING")
+# ...unless a block has more of them than this, then the block is scanned
+MAX_NOTABLE = 64
+
+
+@dataclass(frozen=True)
+class LogEntry:
+    offset: int
+    end: int
+    time: Optional[str]
+    level: str
+    text: str
+
+
+def parse(data: bytes, start: int = 0) -> Iterator[Tuple[int, int, Optional[re.Match]]]:
+    """Yields the (offset, end, header) of every record in ``data``."""
+    headers = list(RECORD_PATTERN.finditer(data))
+    if not headers or headers[0].start() > 0:
+        headers.insert(0, None)
+
+    for position, header in enumerate(headers):
+        record_start = header.start() if header else 0
+        record_end = (
+            headers[position + 1].start() if position + 1 < len(headers) else len(data)
+        )
+        if record_end > record_start:
+            yield start + record_start, start + record_end, header
+
+
+def to_entry(data: bytes, start: int, offset: int, end: int, header) -> LogEntry:
+    """The entry for a record found by parse() in ``data`` read from ``start``."""
+    text = data[offset - start : end - start].decode("utf-8", errors="replace")
+    if header is None:
+        return LogEntry(offset, end, None, "INFO", text.rstrip("\n"))
+
+    entry_time, level = header.group("time").decode(), header.group("level").decode()
+    try:
+        record = json.loads(text)
+        text = f"{entry_time} {level} {record['message']}"
+        for key in ("exception", "stack"):
+            if record.get(key):
+                text += "\n" + record[key]
+    except (ValueError, KeyError):
+        text = text.rstrip("\n")
+    return LogEntry(offset, end, entry_time, level, text)
+
+
+def in_range(entry_time: Optional[str], since: Optional[str], until: Optional[str]):
+    if not since and not until:
+        return True
+    if entry_time is None:
+        return False
+    return (not since or entry_time >= since) and (not until or entry_time <= until)
+
+
+@dataclass
+class LogBlock:
+    """A run of whole records starting at ``offset``, as stored in the index."""
+
+    offset: int
+    first_time: Optional[str] = None
+    last_time: Optional[str] = None
+    max_level: int = 0
+    # Offsets of the WARNING, ERROR and CRITICAL records, per level, with None
+    # for a level that has more than MAX_NOTABLE of them
+    notable: list = field(default_factory=lambda: [[] for _ in LEVELS[NOTABLE_LEVEL:]])
+
+    def add(self, offset: int, entry_time: Optional[str], level: int):
+        if entry_time:
+            self.first_time = self.first_time or entry_time
+            self.last_time = entry_time
+        self.max_level = max(self.max_level, level)
+        if level >= NOTABLE_LEVEL:
+            offsets = self.notable[level - NOTABLE_LEVEL]
+            if offsets is not None:
+                offsets.append(offset)
+                if len(offsets) > MAX_NOTABLE:
+                    self.notable[level - NOTABLE_LEVEL] = None
+
+    def notable_offsets(self, min_level: int) -> Optional[List[int]]:
+        """Offsets of the records at or above ``min_level``, None if too many."""
+        if min_level < NOTABLE_LEVEL:
+            return None
+        offsets = []
+        for level_offsets in self.notable[min_level - NOTABLE_LEVEL :]:
+            if level_offsets is None:
+                return None
+            offsets += level_offsets
+        return sorted(offsets)
+
+    def as_list(self) -> list:
+        return [
+            self.offset,
+            self.first_time,
+            self.last_time,
+            self.max_level,
+            self.notable,
+        ]
+
+
+class LogFile:
+    """
+    Reads an uncompressed log file, active or rotated, without loading it.
+
+    An unfiltered tail seeks back from the end of the file. Filtered queries
+    use a sidecar index (``<name>.index.json``) that splits the file into
+    blocks of about BLOCK_SIZE bytes, each with its time range, highest level
+    and the offsets of its warnings and errors. The index is extended with
+    only the bytes appended since it was last saved.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.index_path = self.path.with_name(f"{self.path.name}.index.json")
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def query(
+        self,
+        level: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        before: Optional[int] = None,
+        limit: int = 200,
+    ) -> Tuple[List[LogEntry], Optional[int]]:
+        """
+        Returns up to ``limit`` matching entries that start before the byte
+        offset ``before``, oldest first, and the cursor for the page before.
+        """
+        if not level and not since and not until:
+            return self.tail(before, limit)
+
+        blocks, size = self.index()
+        min_level = LEVELS.index(level) if level else 0
+        before = size if before is None else before
+
+        matches = []
+        with self.path.open("rb") as log_file:
+            for position in range(len(blocks) - 1, -1, -1):
+                block = blocks[position]
+                if block.offset >= before:
+                    continue
+                if since and block.last_time and block.last_time < since:
+                    break
+                if block.max_level < min_level:
+                    continue
+                if until and block.first_time and block.first_time > until:
+                    continue
+
+                end = (
+                    blocks[position + 1].offset if position + 1 < len(blocks) else size
+                )
+                end = min(end, before)
+                offsets = block.notable_offsets(min_level)
+                if offsets is not None:
+                    entries = [
+                        self.read_entry(log_file, offset, end)
+                        for offset in offsets
+                        if offset < end
+                    ]
+                else:
+                    entries = self.read(log_file, block.offset, end)
+
+                matches = [
+                    entry
+                    for entry in entries
+                    if LEVELS.index(entry.level) >= min_level
+                    and in_range(entry.time, since, until)
+                ] + matches
+                if len(matches) > limit:
+                    matches = matches[-limit:]
+                    return matches, matches[0].offset
+        return matches, None
+
+    def tail(
+        self, before: Optional[int] = None, limit: int = 200
+    ) -> Tuple[List[LogEntry], Optional[int]]:
+        """The last ``limit`` entries before ``before``, read backwards in blocks."""
+        end = self.path.stat().st_size if before is None else before
+        entries = []
+        window = BLOCK_SIZE
+        with self.path.open("rb") as log_file:
+            while end > 0 and len(entries) <= limit:
+                start = max(0, end - window)
+                log_file.seek(start)
+                data = log_file.read(end - start)
+                # Skip the partial record at the start of the window
+                header = RECORD_PATTERN.search(data, 1 if start else 0)
+                if header is None and start:
+                    window *= 2
+                    continue
+                first = start + header.start() if header else start
+                entries = list(self.read(log_file, first, end)) + entries
+                end, window = first, BLOCK_SIZE
+
+        if len(entries) > limit:
+            entries = entries[-limit:]
+            return entries, entries[0].offset
+        return entries, None
+
+    def follow(
+        self,
+        offset: Optional[int] = None,
+        level: Optional[str] = None,
+        timeout: float = 60,
+        interval: float = 1,
+    ) -> Iterator[LogEntry]:
+        """Yields entries appended after ``offset`` (default: the end) until ``timeout``."""
+        min_level = LEVELS.index(level) if level else 0
+        stat = self.path.stat()
+        offset = stat.st_size if offset is None else offset
+        inode = stat.st_ino
+        deadline = time.monotonic() + timeout
+
+        while time.monotonic() < deadline:
+            try:
+                stat = self.path.stat()
+            except FileNotFoundError:
+                stat = None  # Between a rotation and the next record
+            if stat and (stat.st_ino != inode or stat.st_size < offset):
+                offset, inode = 0, stat.st_ino  # Rotated or truncated
+            size = stat.st_size if stat else offset
+            if size > offset:
+                with self.path.open("rb") as log_file:
+                    entries = list(self.read(log_file, offset, size, complete=True))
+                for entry in entries:
+                    offset = entry.end
+                    if LEVELS.index(entry.level) >= min_level:
+                        yield entry
+            time.sleep(interval)
+
+    def read(
+        self, log_file, start: int, end: int, complete: bool = False
+    ) -> List[LogEntry]:
+        """
+        Parses the records between two byte offsets. With ``complete``, a
+        trailing line without a newline is left for the next read.
+        """
+        log_file.seek(start)
+        data = log_file.read(end - start)
+        if complete:
+            data = data[: data.rfind(b"\n") + 1]
+        return [to_entry(data, start, *record) for record in parse(data, start)]
+
+    def read_entry(self, log_file, offset: int, end: int) -> LogEntry:
+        """The single record starting at ``offset``."""
+        window = 4096
+        while True:
+            log_file.seek(offset)
+            data = log_file.read(min(window, end - offset))
+            header = RECORD_PATTERN.search(data, 1)
+            if header or offset + len(data) >= end:
+                break
+            window *= 4
+        record_end = offset + header.start() if header else end
+        return self.read(log_file, offset, record_end)[0]
+
+    def index(self) -> Tuple[List[LogBlock], int]:
+        """Loads the block index and extends it to the current end of the file."""
+        stat = self.path.stat()
+        state = self.load_index()
+        if (
+            state is None
+            or state["inode"] != stat.st_ino
+            or state["size"] > stat.st_size
+        ):
+            state = {"inode": stat.st_ino, "size": 0, "blocks": []}
+
+        blocks = [LogBlock(*block) for block in state["blocks"]]
+        if state["size"] < stat.st_size:
+            # Re-scan the last block, more records may have been added to it
+            start = blocks.pop().offset if blocks else 0
+            blocks += self.scan(start, stat.st_size)
+            state.update(
+                size=stat.st_size, blocks=[block.as_list() for block in blocks]
+            )
+            self.save_index(state)
+        return blocks, stat.st_size
+
+    def scan(self, start: int, end: int) -> List[LogBlock]:
+        """Indexes the record headers between two offsets, a chunk at a time."""
+        blocks = [LogBlock(start)]
+        with self.path.open("rb") as log_file:
+            offset = start
+            while offset < end:
+                log_file.seek(offset)
+                data = log_file.read(min(READ_SIZE, end - offset))
+                data = data[: data.rfind(b"\n") + 1]
+                if not data:
+                    break  # A partial last line, picked up next time
+
+                for header in RECORD_PATTERN.finditer(data):
+                    record_offset = offset + header.start()
+                    block = blocks[-1]
+                    if record_offset - block.offset >= BLOCK_SIZE:
+                        block = LogBlock(record_offset)
+                        blocks.append(block)
+                    entry_time = header.group("time")
+                    block.add(
+                        record_offset,
+                        entry_time.decode() if entry_time else None,
+                        LEVELS.index(header.group("level").decode()),
+                    )
+                offset += len(data)
+        return blocks
+
+    def load_index(self) -> Optional[dict]:
+        try:
+            return json.loads(self.index_path.read_text("utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def save_index(self, state: dict):
+        temporary = self.index_path.with_name(f".{self.index_path.name}.tmp")
+        try:
+            temporary.write_text(json.dumps(state), "utf-8")
+            os.replace(temporary, self.index_path)
+        except OSError:
+            pass  # A read-only log directory only costs a re-scan next time
+
+
+class CompressedLogFile:
+    """A gzipped segment, read whole since gzip can't seek."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def query(
+        self,
+        level: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        before: Optional[int] = None,
+        limit: int = 200,
+    ) -> Tuple[List[LogEntry], Optional[int]]:
+        data = gzip.decompress(self.path.read_bytes())
+        if before is not None:
+            data = data[:before]
+        min_level = LEVELS.index(level) if level else 0
+
+        # Match on the headers and only decode the records that are returned
+        records = [
+            (offset, end, header)
+            for offset, end, header in parse(data)
+            if (LEVELS.index(header.group("level").decode()) if header else 1)
+            >= min_level
+            and in_range(header and header.group("time").decode(), since, until)
+        ]
+        entries = [to_entry(data, 0, *record) for record in records[-limit:]]
+        if len(records) > limit:
+            return entries, entries[0].offset
+        return entries, None
+
+
+@dataclass(frozen=True)
+class Segment:
+    seq: int
+    name: str
+    first_time: Optional[str]
+    last_time: Optional[str]
+    levels: dict
+    size: int
+
+    @property
+    def max_level(self) -> int:
+        return max((LEVELS.index(level) for level in self.levels), default=0)
+
+
+class LogStore:
+    """
+    The active log file plus the segments rotated out of it by
+    SegmentedFileHandler, as ``<name>.<seq>.jsonl`` or ``.jsonl.gz`` next to
+    it. ``<name>.segments.json`` lists every segment with its time range and
+    the number of records per level, so a query only opens the segments that
+    can hold a match.
+
+    Cursors are ``<seq>:<offset>``. The active file gets the sequence number
+    its segment will have once rotated, and rotating (or compressing) keeps
+    the byte offsets, so cursors stay valid across rotations.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.segments_path = self.path.with_name(f"{self.path.name}.segments.json")
+        self.lock_path = self.path.with_name(f"{self.path.name}.lock")
+
+    def exists(self) -> bool:
+        return self.path.exists() or bool(self.load()["segments"])
+
+    def segments(self) -> List[Segment]:
+        return [Segment(**segment) for segment in self.load()["segments"]]
+
+    def query(
+        self,
+        level: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        before: Optional[str] = None,
+        limit: int = 200,
+    ) -> Tuple[List[LogEntry], Optional[str]]:
+        """Up to ``limit`` entries before the cursor ``before``, oldest first."""
+        cursor = CURSOR_PATTERN.match(before or "")
+        if before and not cursor:
+            raise ValueError(f"Invalid cursor {before!r}")
+        before_seq, before_offset = map(int, cursor.groups()) if cursor else (None, 0)
+
+        state = self.load()
+        min_level = LEVELS.index(level) if level else 0
+        sources = [(state["next"], LogFile(self.path), None)] + [
+            (segment.seq, self.reader(segment), segment)
+            for segment in reversed([Segment(**data) for data in state["segments"]])
+        ]
+
+        matches = []
+        for seq, reader, segment in sources:
+            if before_seq is not None and seq > before_seq:
+                continue
+            if segment is not None:
+                if since and segment.last_time and segment.last_time < since:
+                    break
+                if until and segment.first_time and segment.first_time > until:
+                    continue
+                if segment.max_level < min_level:
+                    continue
+            elif not reader.exists():
+                continue
+
+            entries, older = reader.query(
+                level=level,
+                since=since,
+                until=until,
+                before=before_offset if seq == before_seq else None,
+                limit=limit - len(matches),
+            )
+            matches = entries + matches
+            if older is not None:
+                return matches, f"{seq}:{older}"
+            if len(matches) >= limit:
+                return matches, f"{seq}:{matches[0].offset}"
+        return matches, None
+
+    def follow(self, *args, **kwargs) -> Iterator[LogEntry]:
+        return LogFile(self.path).follow(*args, **kwargs)
+
+    def reader(self, segment: Segment):
+        path = self.path.with_name(segment.name)
+        return CompressedLogFile(path) if path.suffix == ".gz" else LogFile(path)
+
+    def rotate(self, compress: bool = True, backup_count: int = 0):
+        """Moves the active file into a new segment. Call with the lock held."""
+        state = self.load()
+        seq = state["next"]
+        target = self.path.with_name(f"{self.path.name}.{seq:06d}.jsonl")
+        os.replace(self.path, target)
+
+        # The block index follows the renamed file, a compressed one needs none
+        active_index = LogFile(self.path).index_path
+        if compress:
+            active_index.unlink(missing_ok=True)
+        elif active_index.exists():
+            os.replace(active_index, LogFile(target).index_path)
+
+        segment = summarize(target, seq)
+        if compress:
+            compressed = target.with_name(target.name + ".gz")
+            temporary = target.with_name(f".{compressed.name}.tmp")
+            with target.open("rb") as source, gzip.open(temporary, "wb") as output:
+                while chunk := source.read(READ_SIZE):
+                    output.write(chunk)
+            os.replace(temporary, compressed)
+            target.unlink()
+            segment = Segment(**{**asdict(segment), "name": compressed.name})
+
+        state["segments"].append(asdict(segment))
+        state["next"] = seq + 1
+        while backup_count and len(state["segments"]) > backup_count:
+            path = self.path.with_name(state["segments"].pop(0)["name"])
+            path.unlink(missing_ok=True)
+            LogFile(path).index_path.unlink(missing_ok=True)
+        self.save(state)
+
+    @contextmanager
+    def locked(self, shared: bool = False):
+        """
+        An flock shared by every process writing the log: writers hold it
+        shared, rotation holds it exclusively. The lock file is opened each
+        time, as a descriptor inherited over fork() would share the lock.
+        Without fcntl nothing is locked, so only one process may write.
+        """
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def load(self) -> dict:
+        try:
+            return json.loads(self.segments_path.read_text("utf-8"))
+        except FileNotFoundError:
+            return {"next": 1, "segments": []}
+
+    def save(self, state: dict):
+        temporary = self.segments_path.with_name(f".{self.segments_path.name}.tmp")
+        temporary.write_text(json.dumps(state, indent=1), "utf-8")
+        os.replace(temporary, self.segments_path)
+
+
+def summarize(path: Path, seq: int) -> Segment:
+    """The index entry of a segment: time range and records per level."""
+    first_time, last_time, levels, size = None, None, {}, 0
+    with path.open("rb") as log_file:
+        while data := log_file.read(READ_SIZE):
+            # Records never span chunks when cut after the last newline
+            data += log_file.readline()
+            size += len(data)
+            for header in RECORD_PATTERN.finditer(data):
+                last_time = header.group("time").decode()
+                first_time = first_time or last_time
+                level = header.group("level").decode()
+                levels[level] = levels.get(level, 0) + 1
+    return Segment(seq, path.name, first_time, last_time, levels, size)
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, starting with the keys RECORD_PATTERN matches."""
+
+    def format(self, record):
+        data = {
+            "time": self.formatTime(record, TIME_FORMAT),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        if record.stack_info:
+            data["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class SegmentedFileHandler(logging.handlers.WatchedFileHandler):
+    """
+    Appends to ``filename`` and rotates it into a LogStore segment once it
+    holds ``max_bytes`` or its first record is ``max_age`` seconds old,
+    keeping the newest ``backup_count`` segments (0 keeps all of them).
+
+    The web workers and the scheduler share the file: each write holds the
+    store lock shared, and a rotation holds it exclusively, so no process
+    writes to a file while it is being moved. Like WatchedFileHandler, the
+    other processes reopen the file once it has been rotated.
+    """
+
+    def __init__(
+        self,
+        filename,
+        max_bytes: int = 10 * 1024 * 1024,
+        max_age: int = 24 * 60 * 60,
+        backup_count: int = 30,
+        compress: bool = True,
+        encoding: str = "utf-8",
+    ):
+        super().__init__(filename, encoding=encoding)
+        self.store = LogStore(filename)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backup_count = backup_count
+        self.compress = compress
+        self.started = (None, None)  # (inode, time of its first record)
+
+    def emit(self, record):
+        try:
+            with self.store.locked(shared=True):
+                super().emit(record)
+            if self.should_rotate():
+                with self.store.locked():
+                    # Another process may have rotated it in the meantime
+                    self.reopenIfNeeded()
+                    if self.should_rotate():
+                        self.store.rotate(self.compress, self.backup_count)
+                        self.reopenIfNeeded()
+        except Exception:
+            self.handleError(record)
+
+    def should_rotate(self) -> bool:
+        if self.stream is None:
+            return False
+        stat = os.fstat(self.stream.fileno())
+        if self.max_bytes and stat.st_size >= self.max_bytes:
+            return True
+        if not self.max_age or not stat.st_size:
+            return False
+
+        inode, started = self.started
+        if inode != stat.st_ino or started is None:
+            try:
+                with open(self.baseFilename, "rb") as log_file:
+                    header = RECORD_PATTERN.match(log_file.readline())
+            except FileNotFoundError:
+                return False  # Just rotated by another process
+            started = header and datetime.strptime(
+                header.group("time").decode(), TIME_FORMAT
+            )
+            self.started = (stat.st_ino, started)
+        return bool(started) and time.time() - started.timestamp() >= self.max_age
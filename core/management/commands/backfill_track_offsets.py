@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Subquery
+
+from core.models import DataVersion, PlaylistSong
+from core.tracklist import parse_offset
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill offset_seconds and track_index of the song links created before "
+        "ingestion recorded them, one playlist at a time in link order."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--all", action="store_true", help="Recompute every playlist's links."
+        )
+
+    def handle(self, *args, **options):
+        links = PlaylistSong.objects.order_by("playlist_id", "pk").only(
+            "pk", "playlist_id", "position"
+        )
+        if not options["all"]:
+            # Whole playlists, so track indexes stay consecutive
+            pending = PlaylistSong.objects.filter(track_index__isnull=True)
+            links = links.filter(
+                playlist_id__in=Subquery(pending.values("playlist_id"))
+            )
+
+        batch, updated, playlist_id, index = [], 0, None, 0
+        for link in links.iterator(chunk_size=options["batch_size"]):
+            index = index + 1 if link.playlist_id == playlist_id else 0
+            playlist_id = link.playlist_id
+            link.offset_seconds = parse_offset(link.position)
+            link.track_index = index
+            batch.append(link)
+            if len(batch) >= options["batch_size"]:
+                updated += self.save(batch)
+                batch = []
+        updated += self.save(batch)
+
+        if updated:
+            DataVersion.objects.bump()
+        self.stdout.write(self.style.SUCCESS(f"⏱️ Backfilled {updated} song links"))
+
+    def save(self, links: list) -> int:
+        return PlaylistSong.objects.bulk_update(
+            links, ["offset_seconds", "track_index"]
+        )
@@ -0,0 +1,168 @@
+import json
+import logging
+import os
+from pathlib import Path
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.benchmark.profiler import Profiler
+from core.benchmark.stub import RESPONSES_DIR, StubApi, StubTransport
+from core.scripts.main import AsyncPlaylistManager, PlaylistManager, RateLimiter
+
+INSTRUMENTED_METHODS = [
+    "fetch_playlist_items",
+    "parse_playlist_items",
+    "bulk_update_db",
+    "harvest_comments",
+    "update_video_metadata",
+    "local_metadata",
+    "fetch_metadata",
+    "fetch_batch_metadata",
+    "save_metadata_batch",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark generate_playlist(), harvest_comments() and generate() against "
+        "stubbed YouTube and OpenRouter APIs in a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--videos", type=int, default=1000)
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=0,
+            help="Use AsyncPlaylistManager with this many concurrent requests.",
+        )
+        parser.add_argument("--llm-batching", action="store_true")
+        parser.add_argument(
+            "--clean-share",
+            type=float,
+            default=0.5,
+            help="Share of videos whose description has a clean tracklist.",
+        )
+        parser.add_argument(
+            "--comment-share",
+            type=float,
+            default=0.3,
+            help="Share of videos with a tracklist in the top comments.",
+        )
+        parser.add_argument(
+            "--latency", type=float, default=0.0, help="Stub latency in ms."
+        )
+        parser.add_argument("--responses", type=Path, default=RESPONSES_DIR)
+        parser.add_argument("--no-memory", action="store_true")
+        parser.add_argument("--json", type=Path, help="Write results to this file.")
+        parser.add_argument(
+            "--baseline", type=Path, help="Fail if slower than this results file."
+        )
+        parser.add_argument("--tolerance", type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        for name in ("GOOGLE_API_KEY", "OPENROUTER_API_KEY"):
+            os.environ.setdefault(name, "benchmark")
+        if options["verbosity"] < 2:
+            logging.getLogger("fuminsho").disabled = True
+
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            profiler = self.benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.report(profiler)
+        results = profiler.as_dict()
+        if options["json"]:
+            options["json"].write_text(json.dumps(results, indent=2))
+        if options["baseline"]:
+            self.compare(results, options["baseline"], options["tolerance"])
+
+    def benchmark(self, options) -> Profiler:
+        api = StubApi(
+            options["videos"],
+            clean_share=options["clean_share"],
+            comment_share=options["comment_share"],
+            responses_dir=options["responses"],
+        )
+        transport = StubTransport(api, latency=options["latency"] / 1000)
+        if options["concurrency"] > 1:
+            manager = AsyncPlaylistManager(
+                "PLbenchmark",
+                concurrency=options["concurrency"],
+                transport=transport,
+            )
+            # Only the async path has rate limits; against the stub they would
+            # measure the limiter instead of concurrency
+            manager.rate_limiters = {
+                endpoint: RateLimiter(0) for endpoint in manager.rate_limiters
+            }
+        else:
+            manager = PlaylistManager("PLbenchmark", transport=transport)
+        manager.response_cache = LocMemCache(
+            "benchmark", {"OPTIONS": {"MAX_ENTRIES": options["videos"] * 4}}
+        )
+        manager.llm_batching = options["llm_batching"]
+
+        profiler = Profiler(track_memory=not options["no_memory"])
+        profiler.instrument(manager, INSTRUMENTED_METHODS)
+
+        self.stdout.write(
+            f"🏁 Benchmarking {options['videos']} videos "
+            f"({type(manager).__name__}, concurrency {options['concurrency'] or 1}, "
+            f"rate limits off)"
+        )
+        with profiler.stage("generate_playlist"):
+            manager.generate_playlist(full_scan=True)
+        with profiler.stage("harvest_comments"):
+            manager.harvest_comments()
+        with profiler.stage("generate"):
+            manager.generate()
+        with profiler.stage("generate_playlist (unchanged)"):
+            manager.generate_playlist(full_scan=True)
+
+        manager.close()
+
+        self.stdout.write(f"📡 API calls: {api.calls}")
+        return profiler
+
+    def report(self, profiler: Profiler):
+        self.stdout.write(
+            f"\n{'stage':<32}{'seconds':>10}{'queries':>10}{'peak MiB':>10}"
+        )
+        for name, stats in profiler.stages.items():
+            self.stdout.write(
+                f"{name:<32}{stats.seconds:>10.2f}{stats.queries:>10}{stats.peak_mib:>10.1f}"
+            )
+
+        self.stdout.write(
+            f"\n{'method':<32}{'calls':>10}{'seconds':>10}{'queries':>10}"
+        )
+        for name, stats in profiler.methods.items():
+            if stats.calls:
+                self.stdout.write(
+                    f"{name:<32}{stats.calls:>10}{stats.seconds:>10.2f}{stats.queries:>10}"
+                )
+
+    def compare(self, results: dict, baseline_path: Path, tolerance: float):
+        baseline = json.loads(baseline_path.read_text())
+        regressions = []
+        for name, stats in results["stages"].items():
+            before = baseline["stages"].get(name)
+            if before is None:
+                continue
+            for metric in ("seconds", "queries", "peak_mib"):
+                if before[metric] and stats[metric] > before[metric] * (1 + tolerance):
+                    regressions.append(
+                        f"{name} {metric}: {before[metric]:.2f} -> {stats[metric]:.2f}"
+                    )
+
+        if regressions:
+            raise CommandError("Regressions found:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("✅ No regressions against baseline"))
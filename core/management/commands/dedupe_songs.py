@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+
+from core.canonical import duplicate_groups, song_key
+from core.models import DataVersion, Song
+
+
+class Command(BaseCommand):
+    help = (
+        "Merge songs that are the same track spelled differently (casing, "
+        "credits, swapped artist and title, near-identical titles of an artist) "
+        "into the most linked one, leaving aliases for later ingestions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.8,
+            help="Trigram similarity of two titles of an artist to merge them.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--dry-run", action="store_true", help="List the groups, merge nothing."
+        )
+
+    def handle(self, *args, **options):
+        rows = list(
+            Song.objects.order_by("-playlist_count", "pk").values_list(
+                "pk", "artist", "title"
+            )
+        )
+        groups = duplicate_groups(rows, options["threshold"])
+
+        if options["dry_run"]:
+            names = {
+                pk: f"{artist or '?'} - {title or '?'}" for pk, artist, title in rows
+            }
+            for group in groups:
+                self.stdout.write(" ≈ ".join(names[pk] for pk in group))
+            self.stdout.write(
+                f"🧬 {len(groups)} groups, {sum(map(len, groups)) - len(groups)} "
+                f"songs would be merged"
+            )
+            return
+
+        rekeyed, merged = self.update_keys(options["batch_size"]), 0
+        for start in range(0, len(groups), options["batch_size"]):
+            batch = groups[start : start + options["batch_size"]]
+            merged += Song.objects.merge({group[0]: group[1:] for group in batch})
+        if merged or rekeyed:
+            DataVersion.objects.bump()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"🧬 Merged {merged} duplicates into {len(groups)} songs "
+                f"({rekeyed} keys updated)"
+            )
+        )
+
+    def update_keys(self, batch_size: int) -> int:
+        """Keys songs saved before they had one, or under older normalization rules."""
+        stale = []
+        for song in Song.objects.only(
+            "pk", "artist", "title", "slug", "key"
+        ).iterator():
+            key = song_key(song.artist, song.title) or song.slug
+            if song.key != key:
+                song.key = key
+                stale.append(song)
+        return Song.objects.bulk_update(stale, ["key"], batch_size=batch_size)
@@ -0,0 +1,44 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.export import SiteExporter
+
+
+class Command(BaseCommand):
+    help = (
+        "Render every page to static HTML with gzip and brotli siblings, "
+        "regenerating only pages whose rows changed since the last export."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", type=Path, default=settings.BASE_DIR / "export")
+        parser.add_argument(
+            "--host",
+            default=next(
+                (host for host in settings.ALLOWED_HOSTS if host not in ("*", "")),
+                "localhost",
+            ),
+            help="Host used for absolute (canonical) links.",
+        )
+        parser.add_argument("--insecure", action="store_true", help="Link over http.")
+        parser.add_argument(
+            "--force", action="store_true", help="Ignore the manifest, render all."
+        )
+
+    def handle(self, *args, **options):
+        exporter = SiteExporter(
+            options["output"], host=options["host"], secure=not options["insecure"]
+        )
+        stats = exporter.export(force=options["force"])
+        if options["verbosity"] > 1:
+            for path in stats.paths:
+                self.stdout.write(f"  📝 {path}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"📦 {stats.written} written ({stats.bytes / 1024:.0f} KiB), "
+                f"{stats.skipped} unchanged, {stats.removed} removed "
+                f"in {options['output']}"
+            )
+        )
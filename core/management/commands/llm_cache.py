@@ -0,0 +1,96 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from core.models import LLMResponse
+
+
+class Command(BaseCommand):
+    help = "Inspect, evict or purge cached OpenRouter responses."
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["inspect", "evict", "purge"])
+        parser.add_argument(
+            "--limit", type=int, default=10, help="Entries to list on inspect."
+        )
+        parser.add_argument("--key", help="Purge the entry with this key prefix.")
+        parser.add_argument("--model", help="Purge entries created by this model.")
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            metavar="DAYS",
+            help="Purge entries not used in the last DAYS days.",
+        )
+        parser.add_argument(
+            "--all", action="store_true", help="Purge every cached response."
+        )
+        parser.add_argument(
+            "--policy",
+            choices=["lru", "lfu", "fifo", "none"],
+            help="Evict with this policy instead of LLM_CACHE_POLICY.",
+        )
+        parser.add_argument(
+            "--max-entries",
+            type=int,
+            help="Evict down to this many entries (0 keeps them all).",
+        )
+        parser.add_argument(
+            "--max-age-days",
+            type=int,
+            help="Evict entries not used in this many days (0 keeps them forever).",
+        )
+
+    def handle(self, *args, **options):
+        getattr(self, options["action"])(options)
+
+    def inspect(self, options):
+        summary = LLMResponse.objects.aggregate(
+            entries=Count("pk"), hits=Sum("hits"), size=Sum(Length("content"))
+        )
+        self.stdout.write(
+            f"📦 {summary['entries']} entries | "
+            f"🎯 {summary['hits'] or 0} hits | "
+            f"💾 {(summary['size'] or 0) / 1024:.1f} KiB"
+        )
+
+        per_model = (
+            LLMResponse.objects.values("model")
+            .annotate(entries=Count("pk"))
+            .order_by("-entries")
+        )
+        for row in per_model:
+            self.stdout.write(f"  🤖 {row['model']}: {row['entries']}")
+
+        recent = LLMResponse.objects.order_by("-last_used_at")[: options["limit"]]
+        for entry in recent:
+            self.stdout.write(
+                f"  🔑 {entry.key[:12]} | {entry.model} | {entry.hits} hits | "
+                f"last used {entry.last_used_at:%Y-%m-%d %H:%M}"
+            )
+
+    def evict(self, options):
+        deleted = LLMResponse.objects.evict(
+            options["policy"], options["max_entries"], options["max_age_days"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"🧹 Evicted {deleted} entries"))
+
+    def purge(self, options):
+        has_filter = options["key"] or options["model"] or options["older_than"]
+        if not has_filter and not options["all"]:
+            self.stderr.write("Pass --key, --model, --older-than or --all.")
+            return
+
+        entries = LLMResponse.objects.all()
+        if options["key"]:
+            entries = entries.filter(key__startswith=options["key"])
+        if options["model"]:
+            entries = entries.filter(model=options["model"])
+        if options["older_than"]:
+            cutoff = timezone.now() - timedelta(days=options["older_than"])
+            entries = entries.filter(last_used_at__lt=cutoff)
+
+        deleted, _ = entries.delete()
+        self.stdout.write(self.style.SUCCESS(f"🗑️ Purged {deleted} entries"))
@@ -0,0 +1,69 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.logs import LEVELS, LogStore
+from fuminsho import settings
+
+TIME_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}( \d{2}:\d{2}(:\d{2})?)?$")
+
+
+class Command(BaseCommand):
+    help = "Query the log file and its rotated segments, or list the segments."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--level", choices=LEVELS, help="Minimum level.")
+        parser.add_argument("--since", help='"YYYY-MM-DD[ HH:MM[:SS]]", local time.')
+        parser.add_argument("--until", help='"YYYY-MM-DD[ HH:MM[:SS]]", local time.')
+        parser.add_argument("--before", help="Cursor printed by a previous query.")
+        parser.add_argument("--limit", type=int, default=100)
+        parser.add_argument("--segments", action="store_true")
+        parser.add_argument(
+            "--follow", action="store_true", help="Print new entries as they come."
+        )
+
+    def handle(self, *args, **options):
+        logs = LogStore(settings.LOGGING["handlers"]["file"]["filename"])
+        if options["segments"]:
+            return self.list_segments(logs)
+        if options["follow"]:
+            for entry in logs.follow(level=options["level"], timeout=float("inf")):
+                self.stdout.write(entry.text)
+            return
+
+        try:
+            entries, older = logs.query(
+                level=options["level"],
+                since=self.time(options["since"], "00:00:00"),
+                until=self.time(options["until"], "23:59:59"),
+                before=options["before"],
+                limit=options["limit"],
+            )
+        except ValueError as e:
+            raise CommandError(e)
+        for entry in entries:
+            self.stdout.write(entry.text)
+        if older:
+            self.stdout.write(self.style.NOTICE(f"Older entries: --before {older}"))
+
+    def list_segments(self, logs: LogStore):
+        for segment in logs.segments():
+            levels = ", ".join(
+                f"{level} {segment.levels[level]}"
+                for level in LEVELS
+                if level in segment.levels
+            )
+            self.stdout.write(
+                f"  {segment.name:<24} {segment.first_time} → {segment.last_time}  "
+                f"{segment.size / 1024 / 1024:.1f} MB  {levels}"
+            )
+
+    def time(self, value, fill: str):
+        """Completes a partial time with the start or end of the day or minute."""
+        if not value:
+            return None
+        if not TIME_PATTERN.match(value):
+            raise CommandError(f"Invalid time {value!r}")
+        date, _, clock = value.partition(" ")
+        clock = clock + fill[len(clock) :] if clock else fill
+        return f"{date} {clock}"
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Genre, Song
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized playlist_count of every song and genre."
+
+    def handle(self, *args, **options):
+        songs = Song.objects.rebuild_playlist_counts()
+        genres = Genre.objects.rebuild_playlist_counts()
+        self.stdout.write(
+            self.style.SUCCESS(f"🔢 Recounted {songs} songs and {genres} genres")
+        )
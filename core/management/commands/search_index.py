@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.search import KINDS, rebuild_index, search
+
+
+class Command(BaseCommand):
+    help = "Rebuild or query the playlist, song and genre search index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["rebuild", "query"])
+        parser.add_argument("query", nargs="?", default="")
+        parser.add_argument("--type", choices=KINDS, help="Only return this kind.")
+        parser.add_argument("--limit", type=int, default=20)
+
+    def handle(self, *args, **options):
+        getattr(self, options["action"])(options)
+
+    def rebuild(self, options):
+        if connection.vendor != "sqlite":
+            self.stdout.write("PostgreSQL keeps its GIN indexes current, skipping")
+            return
+        indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"🔎 Indexed {indexed} entries"))
+
+    def query(self, options):
+        kinds = [options["type"]] if options["type"] else None
+        for result in search(options["query"], kinds=kinds, limit=options["limit"]):
+            self.stdout.write(
+                f"  {result.kind:<9} {result.rank:>8.2f}  {result.title}"
+                + (f" | {result.subtitle}" if result.subtitle else "")
+            )
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_playlist_content_hash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScanCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("playlist_id", models.CharField(max_length=255, unique=True)),
+                ("page_token", models.CharField(blank=True, max_length=255, null=True)),
+                ("full_scan", models.BooleanField(default=False)),
+                ("pages_done", models.IntegerField(default=0)),
+                ("started_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("completed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
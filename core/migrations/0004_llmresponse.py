@@ -0,0 +1,34 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_scancheckpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LLMResponse",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=64, unique=True)),
+                ("model", models.CharField(max_length=255)),
+                ("content", models.TextField()),
+                ("parsed", models.JSONField(default=dict)),
+                ("hits", models.IntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("last_used_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_llmresponse"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="playlist",
+            index=models.Index(
+                fields=["position", "id"], name="core_playli_positio_8d2e4f_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="playlist",
+            index=models.Index(
+                fields=["duration", "id"], name="core_playli_duratio_81d1ba_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="playlist",
+            index=models.Index(
+                fields=["published_at", "id"], name="core_playli_publish_386886_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from core import search
+
+
+def create_search_index(apps, schema_editor):
+    search.create_index(schema_editor, apps)
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_index(schema_editor, apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_playlist_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
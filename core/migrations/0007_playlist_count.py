@@ -0,0 +1,50 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:13
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from core import search
+
+
+def populate_playlist_counts(apps, schema_editor):
+    for model_name, link_name in (("Song", "PlaylistSong"), ("Genre", "PlaylistGenre")):
+        model = apps.get_model("core", model_name)
+        link = apps.get_model("core", link_name)
+        field = model._meta.model_name
+        counts = (
+            link.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        model.objects.update(playlist_count=Coalesce(Subquery(counts), 0))
+
+
+def restore_search_triggers(apps, schema_editor):
+    # Adding playlist_count rebuilds core_song and core_genre on SQLite,
+    # which drops their triggers
+    search.restore_triggers(schema_editor, apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="genre",
+            name="playlist_count",
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name="song",
+            name="playlist_count",
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(populate_playlist_counts, migrations.RunPython.noop),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
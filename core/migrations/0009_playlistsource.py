@@ -0,0 +1,55 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_dataversion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlaylistSource",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("playlist_id", models.CharField(max_length=255, unique=True)),
+                ("title", models.CharField(blank=True, max_length=500)),
+                ("is_active", models.BooleanField(default=True)),
+                ("last_video_id", models.CharField(blank=True, max_length=255)),
+                ("last_scanned_at", models.DateTimeField(blank=True, null=True)),
+                ("last_full_scan_at", models.DateTimeField(blank=True, null=True)),
+                ("last_error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["is_active", "last_scanned_at"],
+                        name="core_playli_is_acti_af3a0f_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddField(
+            model_name="playlist",
+            name="source",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="videos",
+                to="core.playlistsource",
+            ),
+        ),
+    ]
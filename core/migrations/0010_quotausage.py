@@ -0,0 +1,35 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_playlistsource"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QuotaUsage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("endpoint", models.CharField(max_length=50)),
+                ("units", models.PositiveIntegerField(default=0)),
+                ("calls", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "unique_together": {("day", "endpoint")},
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_quotausage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="playlist",
+            name="removed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="playlistsource",
+            name="item_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="scancheckpoint",
+            name="page_index",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="PlaylistPage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("index", models.IntegerField()),
+                ("page_token", models.CharField(blank=True, max_length=255)),
+                ("items", models.JSONField(default=list)),
+                ("fingerprint", models.CharField(max_length=64)),
+                ("fetched_at", models.DateTimeField(auto_now=True)),
+                (
+                    "source",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pages",
+                        to="core.playlistsource",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("source", "index")},
+            },
+        ),
+    ]
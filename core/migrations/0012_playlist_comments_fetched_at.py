@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_playlistpage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="playlist",
+            name="comments_fetched_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="playlist",
+            name="comments_retry_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_playlist_comments_fetched_at"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="playlistsong",
+            options={"ordering": ["track_index", "id"]},
+        ),
+        migrations.AddField(
+            model_name="playlistsong",
+            name="offset_seconds",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="playlistsong",
+            name="track_index",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="playlistsong",
+            index=models.Index(
+                fields=["playlist", "offset_seconds"],
+                name="core_playli_playlis_5644fd_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="playlistsong",
+            index=models.Index(
+                fields=["playlist", "track_index"],
+                name="core_playli_playlis_59dc5a_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core import search
+
+
+def restore_search_triggers(apps, schema_editor):
+    # Adding Song.key rebuilds core_song on SQLite, which drops its triggers
+    search.restore_triggers(schema_editor, apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_playlistsong_offset_seconds"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="song",
+            name="key",
+            field=models.CharField(blank=True, db_index=True, max_length=800),
+        ),
+        migrations.CreateModel(
+            name="SongAlias",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("slug", models.SlugField(max_length=800, unique=True)),
+                ("key", models.CharField(blank=True, db_index=True, max_length=800)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "song",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="aliases",
+                        to="core.song",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
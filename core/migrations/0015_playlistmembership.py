@@ -0,0 +1,99 @@
+# Generated by Django 5.1.2 on 2026-10-18 11:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core import search
+
+
+def copy_memberships(apps, schema_editor):
+    Playlist = apps.get_model("core", "Playlist")
+    PlaylistMembership = apps.get_model("core", "PlaylistMembership")
+    playlists = Playlist.objects.filter(source__isnull=False).values_list(
+        "pk", "source_id", "position", "removed_at"
+    )
+    PlaylistMembership.objects.bulk_create(
+        [
+            PlaylistMembership(
+                playlist_id=pk,
+                source_id=source_id,
+                position=position,
+                removed_at=removed_at,
+            )
+            for pk, source_id, position, removed_at in playlists.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+def restore_search_triggers(apps, schema_editor):
+    # Removing Playlist.source rebuilds core_playlist on SQLite, which drops
+    # its triggers
+    search.restore_triggers(schema_editor, apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_songalias"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlaylistMembership",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("position", models.IntegerField(blank=True, null=True)),
+                ("removed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "playlist",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="memberships",
+                        to="core.playlist",
+                    ),
+                ),
+                (
+                    "source",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="memberships",
+                        to="core.playlistsource",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="playlist",
+            name="sources",
+            field=models.ManyToManyField(
+                related_name="videos",
+                through="core.PlaylistMembership",
+                to="core.playlistsource",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="playlistmembership",
+            index=models.Index(
+                fields=["source", "position"], name="core_playli_source__b04757_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="playlistmembership",
+            unique_together={("source", "playlist")},
+        ),
+        migrations.RunPython(copy_memberships, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="playlist",
+            name="source",
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,15 @@
-from django.db import models
-from django.db.models import Value, CharField
-from django.db.models.functions import Concat
+from datetime import date, timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value, CharField
+from django.db.models.functions import Coalesce, Concat
+from django.utils import timezone
 from django.utils.text import slugify
 
+from core.canonical import song_key
+
 
 class PlaylistManager(models.Manager):
     def get_queryset(self):
@@ -18,6 +25,91 @@ class PlaylistManager(models.Manager):
             )
         )
 
+    def listed(self) -> models.QuerySet:
+        """Videos still listed by a playlist source, the ones the site shows."""
+        return self.filter(removed_at__isnull=True)
+
+
+class PlaylistSourceManager(models.Manager):
+    def stale_first(self) -> models.QuerySet:
+        """Active sources, the ones scanned longest ago (or never) first."""
+        return self.filter(is_active=True).order_by(
+            F("last_scanned_at").asc(nulls_first=True), "pk"
+        )
+
+    def full_scan_due(self, interval: timedelta) -> models.QuerySet:
+        cutoff = timezone.now() - interval
+        return self.filter(
+            models.Q(last_full_scan_at__isnull=True)
+            | models.Q(last_full_scan_at__lt=cutoff)
+        )
+
+    def seed(self, playlist_id: str, last_video_id: str = "") -> "PlaylistSource":
+        source, created = self.get_or_create(
+            playlist_id=playlist_id, defaults={"last_video_id": last_video_id}
+        )
+        if created:
+            # Videos ingested before there were sources came from this playlist
+            orphans = Playlist.objects.filter(memberships__isnull=True).values_list(
+                "pk", "position", "removed_at"
+            )
+            PlaylistMembership.objects.bulk_create(
+                [
+                    PlaylistMembership(
+                        source=source,
+                        playlist_id=pk,
+                        position=position,
+                        removed_at=removed_at,
+                    )
+                    for pk, position, removed_at in orphans.iterator()
+                ],
+                batch_size=1000,
+            )
+        return source
+
+
+# PlaylistSource (A YouTube playlist to ingest, with its incremental scan state)
+class PlaylistSource(models.Model):
+    playlist_id = models.CharField(max_length=255, unique=True)
+    title = models.CharField(max_length=500, blank=True)
+    is_active = models.BooleanField(default=True)
+    # The playlist's last video when a scan last reached its end
+    last_video_id = models.CharField(max_length=255, blank=True)
+    last_scanned_at = models.DateTimeField(blank=True, null=True)
+    last_full_scan_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    # Items YouTube reported on the last page fetched, deleted and private ones included
+    item_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = PlaylistSourceManager()
+
+    class Meta:
+        indexes = [models.Index(fields=["is_active", "last_scanned_at"])]
+
+    def __str__(self):
+        return self.title or self.playlist_id
+
+
+# PlaylistPage (Fingerprint of a page of a playlist source, to tell which pages changed)
+class PlaylistPage(models.Model):
+    source = models.ForeignKey(
+        PlaylistSource, on_delete=models.CASCADE, related_name="pages"
+    )
+    index = models.IntegerField()
+    # Token that fetches this page, empty for the first one
+    page_token = models.CharField(max_length=255, blank=True)
+    # [video_id, position, etag] of each item, see core.diff
+    items = models.JSONField(default=list)
+    fingerprint = models.CharField(max_length=64)
+    fetched_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("source", "index")
+
+    def __str__(self):
+        return f"{self.source} page {self.index}"
+
 
 # Playlist Model
 class Playlist(models.Model):
@@ -26,13 +118,24 @@ class Playlist(models.Model):
     description = models.TextField(blank=True, null=True)
     published_at = models.DateTimeField(blank=True, null=True)
     thumbnails = models.URLField(max_length=500, blank=True, null=True)
+    # Position in the first source still listing the video, see PlaylistMembership
     position = models.IntegerField(blank=True, null=True)
     video_owner_channel_title = models.CharField(max_length=255)
     video_owner_channel_id = models.CharField(max_length=255)
     duration = models.DurationField(blank=True, null=True)
     fetched_at = models.DateTimeField(auto_now_add=True)
     helpful_comment = models.TextField(blank=True, null=True)
+    # When the comments were last fetched, and when a video without a
+    # tracklist in them may be looked at again
+    comments_fetched_at = models.DateTimeField(blank=True, null=True)
+    comments_retry_at = models.DateTimeField(blank=True, null=True)
     is_favorite = models.BooleanField(default=False)
+    content_hash = models.CharField(max_length=64, blank=True, default="")
+    sources = models.ManyToManyField(
+        PlaylistSource, through="PlaylistMembership", related_name="videos"
+    )
+    # Set once no source lists the video anymore
+    removed_at = models.DateTimeField(blank=True, null=True)
 
     # Many-to-many relationships
     genres = models.ManyToManyField("Genre", through="PlaylistGenre")  # With Genre
@@ -42,33 +145,180 @@ class Playlist(models.Model):
 
     class Meta:
         ordering = ["position"]
-        indexes = [models.Index(fields=["video_id", "position"])]
+        indexes = [
+            models.Index(fields=["video_id", "position"]),
+            # Keyset pagination of the playlists page
+            models.Index(fields=["position", "id"]),
+            models.Index(fields=["duration", "id"]),
+            models.Index(fields=["published_at", "id"]),
+        ]
 
     def __str__(self):
         return self.title
 
 
+# PlaylistMembership (A video's position in one playlist source)
+class PlaylistMembership(models.Model):
+    source = models.ForeignKey(
+        PlaylistSource, on_delete=models.CASCADE, related_name="memberships"
+    )
+    playlist = models.ForeignKey(
+        Playlist, on_delete=models.CASCADE, related_name="memberships"
+    )
+    position = models.IntegerField(blank=True, null=True)
+    # Set when a scan finds the video is no longer in this source
+    removed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        unique_together = ("source", "playlist")
+        indexes = [models.Index(fields=["source", "position"])]
+
+    def __str__(self):
+        return f"{self.playlist} in {self.source}"
+
+
+class PopularityManager(models.Manager):
+    """Maintains the denormalized ``playlist_count`` of songs and genres."""
+
+    def links(self) -> models.QuerySet:
+        through = self.model.playlist_set.through
+        return through.objects.filter(**{self.model._meta.model_name: OuterRef("pk")})
+
+    def increment_playlist_counts(self, counts: dict[int, int]) -> None:
+        """Adds ``counts`` (pk -> new playlist links) with one UPDATE per step."""
+        by_step = {}
+        for pk, step in counts.items():
+            by_step.setdefault(step, []).append(pk)
+        for step, pks in by_step.items():
+            self.filter(pk__in=pks).update(playlist_count=F("playlist_count") + step)
+
+    def rebuild_playlist_counts(self, pks=None) -> int:
+        """Recomputes ``playlist_count`` from the link table, of ``pks`` or all."""
+        counts = (
+            self.links()
+            .order_by()
+            .values(self.model._meta.model_name)
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        rows = self.all() if pks is None else self.filter(pk__in=pks)
+        return rows.update(playlist_count=Coalesce(Subquery(counts), 0))
+
+
+class SongManager(PopularityManager):
+    def resolve(self, keys) -> dict[str, int]:
+        """
+        Song pk of each known key (see core.canonical.song_key), through the
+        songs' own keys or the aliases their duplicates left when merged.
+        """
+        ids = dict(SongAlias.objects.filter(key__in=keys).values_list("key", "song_id"))
+        # Before duplicates are merged, the most linked song of a key wins
+        for key, pk in (
+            self.filter(key__in=keys)
+            .order_by("playlist_count", "-pk")
+            .values_list("key", "pk")
+        ):
+            ids[key] = pk
+        return ids
+
+    def merge(self, groups: dict[int, list[int]]) -> int:
+        """
+        Folds the duplicates of each ``{canonical pk: [duplicate pks]}`` into
+        the canonical song: their playlist links move to it (a playlist
+        linking both keeps one link), their slugs and keys become aliases
+        of it, and they are deleted. Moved links are inserted anew instead
+        of updated, so exports still see links as inserted or deleted only.
+        """
+        targets = {pk: target for target, pks in groups.items() for pk in pks}
+        if not targets:
+            return 0
+
+        with transaction.atomic():
+            linked = set(
+                PlaylistSong.objects.filter(song_id__in=groups).values_list(
+                    "playlist_id", "song_id"
+                )
+            )
+            moved = []
+            for link in PlaylistSong.objects.filter(song_id__in=targets).order_by(
+                "track_index", "pk"
+            ):
+                target = targets[link.song_id]
+                if (link.playlist_id, target) not in linked:
+                    linked.add((link.playlist_id, target))
+                    moved.append(
+                        PlaylistSong(
+                            playlist_id=link.playlist_id,
+                            song_id=target,
+                            position=link.position,
+                            offset_seconds=link.offset_seconds,
+                            track_index=link.track_index,
+                        )
+                    )
+            PlaylistSong.objects.filter(song_id__in=targets).delete()
+            PlaylistSong.objects.bulk_create(moved)
+
+            aliases = list(SongAlias.objects.filter(song_id__in=targets))
+            for alias in aliases:
+                alias.song_id = targets[alias.song_id]
+            SongAlias.objects.bulk_update(aliases, ["song_id"])
+            SongAlias.objects.bulk_create(
+                [
+                    SongAlias(slug=slug, key=key, song_id=targets[pk])
+                    for pk, slug, key in self.filter(pk__in=targets).values_list(
+                        "pk", "slug", "key"
+                    )
+                ],
+                ignore_conflicts=True,
+            )
+
+            self.filter(pk__in=targets).delete()
+            self.rebuild_playlist_counts(groups)
+        return len(targets)
+
+
 # Song Model
 class Song(models.Model):
     title = models.CharField(max_length=500, blank=True, null=True)
     artist = models.CharField(max_length=255, blank=True, null=True)
     slug = models.SlugField(max_length=800, unique=True, blank=True)
+    # Normalized identity shared by duplicates, see core.canonical.song_key
+    key = models.CharField(max_length=800, blank=True, db_index=True)
+    playlist_count = models.PositiveIntegerField(default=0, db_index=True)
+
+    objects = SongManager()
 
     def save(self, *args, **kwargs):
         if not self.slug:  # Only generate slug if it doesn't already exist
             slug_base = f"{self.artist or ''} {self.title or ''}"
             if slug_base:  # Ensure there's content to slugify
                 self.slug = slugify(slug_base)
+        if not self.key:
+            self.key = song_key(self.artist, self.title) or self.slug
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.title} - {self.artist}"
 
 
+# SongAlias (A duplicate merged into a song, so its slug and key resolve to it)
+class SongAlias(models.Model):
+    slug = models.SlugField(max_length=800, unique=True)
+    key = models.CharField(max_length=800, blank=True, db_index=True)
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name="aliases")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.slug} → {self.song}"
+
+
 # Genre Model
 class Genre(models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=100, unique=True, blank=True)
+    playlist_count = models.PositiveIntegerField(default=0, db_index=True)
+
+    objects = PopularityManager()
 
     def save(self, *args, **kwargs):
         if not self.slug:  # Only generate slug if it doesn't already exist
@@ -86,9 +336,18 @@ class PlaylistSong(models.Model):
     position = models.CharField(
         max_length=20, blank=True, null=True
     )  # CharField for position
+    # position in seconds, for youtu.be/<id>?t= links; None when it isn't a timestamp
+    offset_seconds = models.PositiveIntegerField(blank=True, null=True)
+    # Order of the track in the playlist's tracklist
+    track_index = models.PositiveSmallIntegerField(blank=True, null=True)
 
     class Meta:
         unique_together = ("playlist", "song")
+        ordering = ["track_index", "id"]
+        indexes = [
+            models.Index(fields=["playlist", "offset_seconds"]),
+            models.Index(fields=["playlist", "track_index"]),
+        ]
 
     def __str__(self):
         return f"{self.song.title} in {self.playlist.title}"
@@ -104,3 +363,174 @@ class PlaylistGenre(models.Model):
 
     def __str__(self):
         return f"{self.playlist.title} - {self.genre.name}"
+
+
+# ScanCheckpoint (Progress of the current playlist scan, used to resume it)
+class ScanCheckpoint(models.Model):
+    playlist_id = models.CharField(max_length=255, unique=True)
+    page_token = models.CharField(max_length=255, blank=True, null=True)
+    full_scan = models.BooleanField(default=False)
+    pages_done = models.IntegerField(default=0)
+    # Index of the page page_token fetches; scans may skip unchanged pages
+    page_index = models.IntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.playlist_id} @ {self.page_token or 'start'}"
+
+
+class LLMResponseManager(models.Manager):
+    EVICTION_ORDERING = {
+        "lru": ["last_used_at"],
+        "lfu": ["hits", "last_used_at"],
+        "fifo": ["created_at"],
+    }
+
+    def lookup(self, key):
+        entry = self.filter(key=key).first()
+        if entry is not None:
+            self.filter(pk=entry.pk).update(
+                hits=F("hits") + 1, last_used_at=timezone.now()
+            )
+        return entry
+
+    def store(self, key, **fields):
+        entry, _ = self.update_or_create(key=key, defaults=fields)
+        return entry
+
+    def evict(self, policy=None, max_entries=None, max_age_days=None) -> int:
+        # An explicit 0 means no limit, only None falls back to the settings
+        if policy is None:
+            policy = settings.LLM_CACHE["POLICY"]
+        if max_entries is None:
+            max_entries = settings.LLM_CACHE["MAX_ENTRIES"]
+        if max_age_days is None:
+            max_age_days = settings.LLM_CACHE["MAX_AGE_DAYS"]
+
+        if policy != "none" and policy not in self.EVICTION_ORDERING:
+            raise ValueError(f"Unknown LLM cache eviction policy: {policy}")
+
+        deleted = 0
+        if max_age_days:
+            cutoff = timezone.now() - timedelta(days=max_age_days)
+            deleted += self.filter(last_used_at__lt=cutoff).delete()[0]
+
+        excess = self.count() - max_entries if max_entries else 0
+        if policy != "none" and excess > 0:
+            evicted = self.order_by(*self.EVICTION_ORDERING[policy]).values_list(
+                "pk", flat=True
+            )[:excess]
+            deleted += self.filter(pk__in=list(evicted)).delete()[0]
+
+        return deleted
+
+
+# LLMResponse (OpenRouter responses keyed by a hash of the full request payload)
+class LLMResponse(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    model = models.CharField(max_length=255)
+    content = models.TextField()
+    parsed = models.JSONField(default=dict)
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True)
+
+    objects = LLMResponseManager()
+
+    def __str__(self):
+        return f"{self.model} 🔑 {self.key[:12]}"
+
+
+class DataVersionManager(models.Manager):
+    def current(self, name: str = "catalog") -> int:
+        version = self.filter(name=name).values_list("version", flat=True).first()
+        return version or 0
+
+    def bump(self, name: str = "catalog") -> None:
+        updated = self.filter(name=name).update(
+            version=F("version") + 1, updated_at=timezone.now()
+        )
+        if not updated:
+            self.get_or_create(name=name, defaults={"version": 1})
+
+    def bump_on_commit(self, name: str = "catalog") -> None:
+        """
+        Bumps once when the current transaction commits, however many rows
+        it changed; right away outside of one.
+        """
+        connection = transaction.get_connection(self.db)
+        for _, pending, _ in connection.run_on_commit:
+            if getattr(pending, "data_version", None) == name:
+                return
+
+        def bump():
+            self.bump(name)
+
+        bump.data_version = name
+        transaction.on_commit(bump, using=self.db)
+
+
+# DataVersion (Bumped whenever the catalog changes, keys the page cache)
+class DataVersion(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = DataVersionManager()
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class QuotaUsageManager(models.Manager):
+    # YouTube resets the daily quota at midnight Pacific time
+    QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+    def day(self) -> date:
+        return timezone.now().astimezone(self.QUOTA_TIMEZONE).date()
+
+    def seconds_left(self) -> float:
+        """Seconds until the quota resets."""
+        now = timezone.now().astimezone(self.QUOTA_TIMEZONE)
+        midnight = (now + timedelta(days=1)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        return (midnight - now).total_seconds()
+
+    def used(self, day: date = None) -> int:
+        units = self.filter(day=day or self.day()).aggregate(units=Sum("units"))
+        return units["units"] or 0
+
+    def record(self, endpoint: str, units: int, calls: int, day: date = None):
+        day = day or self.day()
+        fields = {
+            "units": F("units") + units,
+            "calls": F("calls") + calls,
+            "updated_at": timezone.now(),
+        }
+        if self.filter(day=day, endpoint=endpoint).update(**fields):
+            return
+        _, created = self.get_or_create(
+            day=day, endpoint=endpoint, defaults={"units": units, "calls": calls}
+        )
+        if not created:
+            self.filter(day=day, endpoint=endpoint).update(**fields)
+
+
+# QuotaUsage (YouTube Data API units spent per quota day and endpoint)
+class QuotaUsage(models.Model):
+    day = models.DateField()
+    endpoint = models.CharField(max_length=50)
+    units = models.PositiveIntegerField(default=0)
+    calls = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = QuotaUsageManager()
+
+    class Meta:
+        unique_together = ("day", "endpoint")
+
+    def __str__(self):
+        return f"{self.day} {self.endpoint}: {self.units} units"
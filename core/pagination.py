@@ -0,0 +1,68 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from typing import Any, List, Optional, Tuple
+
+from django.core.exceptions import BadRequest, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q, QuerySet
+
+
+class KeysetPaginator:
+    """
+    Pages through ``queryset`` ordered by ``ordering`` (a field name,
+    optionally prefixed with "-") and the primary key as a tiebreaker.
+    Each page is a single indexed range query, however deep the reader
+    scrolls, and the cursor is an opaque token holding the sort value
+    and primary key of the last row on the previous page.
+    """
+
+    def __init__(self, queryset: QuerySet, ordering: str, page_size: int):
+        self.descending = ordering.startswith("-")
+        self.field_name = ordering.lstrip("-")
+        self.field = queryset.model._meta.get_field(self.field_name)
+        self.page_size = page_size
+
+        expression = F(self.field_name)
+        expression = (
+            expression.desc(nulls_last=True)
+            if self.descending
+            else expression.asc(nulls_last=True)
+        )
+        self.queryset = queryset.order_by(expression, "pk")
+
+    def page(self, cursor: Optional[str] = None) -> Tuple[List[Any], Optional[str]]:
+        queryset = self.queryset
+        if cursor:
+            queryset = queryset.filter(self.after(*self.decode(cursor)))
+
+        rows = list(queryset[: self.page_size + 1])
+        next_cursor = None
+        if len(rows) > self.page_size:
+            rows = rows[: self.page_size]
+            next_cursor = self.encode(rows[-1])
+        return rows, next_cursor
+
+    def after(self, value: Any, pk: int) -> Q:
+        """Rows that sort after (value, pk), with NULL values last."""
+        if value is None:
+            return Q(**{f"{self.field_name}__isnull": True, "pk__gt": pk})
+
+        lookup = "lt" if self.descending else "gt"
+        return (
+            Q(**{f"{self.field_name}__{lookup}": value})
+            | Q(**{self.field_name: value, "pk__gt": pk})
+            | Q(**{f"{self.field_name}__isnull": True})
+        )
+
+    def encode(self, row: Any) -> str:
+        payload = json.dumps(
+            [getattr(row, self.field_name), row.pk], cls=DjangoJSONEncoder
+        )
+        return urlsafe_b64encode(payload.encode()).decode()
+
+    def decode(self, cursor: str) -> Tuple[Any, int]:
+        try:
+            value, pk = json.loads(urlsafe_b64decode(cursor.encode()))
+            return self.field.to_python(value), int(pk)
+        except (ValueError, TypeError, ValidationError):
+            raise BadRequest("Invalid cursor.")
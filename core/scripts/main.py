@@ -1,22 +1,118 @@
+import asyncio
+import functools
 import hashlib
 import json
 import logging
+import math
 import re
-from dataclasses import dataclass
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, replace
+from datetime import timedelta
 from typing import List, Optional
 
 import httpx
 import isodate
-from django.db.models import Q
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import F, Q
 from django.utils import timezone
 from django.utils.text import slugify
 
-from core.models import Genre, Playlist, Song
+from core.canonical import song_key
+from core.client import RETRY_STATUSES, ApiClient, AsyncApiClient, RetryPolicy
+from core.diff import diff, fingerprint, page_entries
+from core.models import (
+    DataVersion,
+    Genre,
+    LLMResponse,
+    Playlist,
+    PlaylistGenre,
+    PlaylistMembership,
+    PlaylistPage,
+    PlaylistSong,
+    PlaylistSource,
+    QuotaUsage,
+    ScanCheckpoint,
+    Song,
+)
+from core.tracklist import Track, extract_tracklist, parse_offset
 from fuminsho.settings import env
 
 logger = logging.getLogger("fuminsho")
 
 
+class QuotaExceeded(Exception):
+    pass
+
+
+class QuotaBudget:
+    """
+    YouTube Data API units shared by every worker of a run. ``daily`` caps
+    the units spent in a quota day by every run together, as recorded in
+    QuotaUsage, and ``limit`` caps this run (0 is unlimited for both).
+
+    spend() only counts in memory, as it is also called from coroutines;
+    flush() records the units per endpoint and picks up what other runs
+    spent in the meantime.
+    """
+
+    def __init__(self, daily: int = 0, limit: int = 0):
+        self.daily = daily
+        self.limit = limit
+        self.spent = 0
+        self.pending = Counter()
+        self.pending_calls = Counter()
+        self.lock = threading.Lock()
+        self.day, self.used, self.exhausted_on = None, 0, None
+        self.refresh()
+
+    def remaining(self) -> Optional[int]:
+        """Units left today, None without a daily budget."""
+        if self.exhausted_on == self.day:
+            return 0
+        return max(self.daily - self.used, 0) if self.daily else None
+
+    def spend(self, endpoint: str, units: int):
+        with self.lock:
+            if self.exhausted_on == self.day:
+                raise QuotaExceeded("YouTube quota is exceeded until it resets")
+            if self.daily and self.used + units > self.daily:
+                raise QuotaExceeded(
+                    f"Daily YouTube quota budget of {self.daily} units is used up"
+                )
+            if self.limit and self.spent + units > self.limit:
+                raise QuotaExceeded(
+                    f"YouTube quota budget of {self.limit} units for this run is used up"
+                )
+            self.used += units
+            self.spent += units
+            self.pending[endpoint] += units
+            self.pending_calls[endpoint] += 1
+
+    def exhaust(self):
+        """YouTube refused a request for quota, stop until the quota resets."""
+        with self.lock:
+            self.exhausted_on = self.day
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, Counter()
+            calls, self.pending_calls = self.pending_calls, Counter()
+        for endpoint, units in pending.items():
+            QuotaUsage.objects.record(endpoint, units, calls[endpoint], self.day)
+        self.refresh()
+
+    def refresh(self):
+        day = QuotaUsage.objects.day()
+        used = QuotaUsage.objects.used(day)
+        with self.lock:
+            self.day = day
+            self.used = used + sum(self.pending.values())
+
+
 @dataclass(frozen=True)
 class PlaylistItem:
     video_id: str
@@ -28,32 +124,75 @@ class PlaylistItem:
     video_owner_channel_id: str
 
 
-@dataclass(frozen=True)
-class Track:
-    artist: Optional[str]
-    title: Optional[str]
-    timestamp: Optional[str]
-
-
 @dataclass(frozen=True)
 class PlaylistMetadata:
     genres: Optional[List[str]]
     tracks: Optional[List[Track]]
 
 
+@dataclass(frozen=True)
+class CommentHarvest:
+    comment: Optional[str] = None
+    confidence: float = 0.0
+    pages: int = 0
+    # Reason YouTube gave for not listing the comments, e.g. commentsDisabled
+    error: Optional[str] = None
+
+
 class PlaylistManager:
     YOUTUBE_API_BASE = "https://www.googleapis.com/youtube/v3"
     OPENROUTER_API_BASE = "https://openrouter.ai/api/v1/chat/completions"
     BATCH_SIZE = 50
     FTP_DIRECTORY = "/"
     AI_MODEL = "mistralai/ministral-3b"
-
-    def __init__(self, playlist_id: str):
+    LOCAL_TRACKLIST_CONFIDENCE = 0.8
+    LLM_BATCH_TOKEN_BUDGET = 4000
+    LLM_BATCH_MAX_VIDEOS = 10
+    # Stored items a page must end with before a scan trusts the rest is unchanged
+    ALIGNED_ITEMS = 10
+    # Comment threads per request (one quota unit whatever the size), pages
+    # looked at per video, and the detector confidence a comment needs
+    COMMENTS_PAGE_SIZE = 25
+    COMMENTS_MAX_PAGES = 3
+    COMMENT_TRACKLIST_CONFIDENCE = 0.5
+    COMMENTS_CHUNK_SIZE = 100
+    COMMENT_RETRY_MAX_DAYS = 180
+    # Videos that will never list comments get the longest wait
+    COMMENTS_GONE_REASONS = ("commentsDisabled", "videoNotFound")
+    # YouTube Data API units per request
+    QUOTA_COSTS = {"playlistItems": 1, "commentThreads": 1, "videos": 1}
+    UPSERT_FIELDS = [
+        "title",
+        "description",
+        "thumbnails",
+        "video_owner_channel_title",
+        "video_owner_channel_id",
+        "content_hash",
+        "fetched_at",
+    ]
+
+    def __init__(
+        self,
+        playlist_id: str,
+        transport: Optional[httpx.MockTransport] = None,
+        quota: Optional[QuotaBudget] = None,
+    ):
         self.playlist_id = playlist_id
-        self.playlist_last_video_id = env("PLAYLIST_LAST_VIDEO_ID")
+        self.source, _ = PlaylistSource.objects.get_or_create(playlist_id=playlist_id)
+        self.quota = quota or QuotaBudget()
         self.google_api_key = env("GOOGLE_API_KEY")
         self.openrouter_api_key = env("OPENROUTER_API_KEY")
-        self.http_client = httpx.Client(timeout=60)
+        self.transport = transport
+        self.http2 = env.bool("HTTP2", default=False)
+        self.retry = RetryPolicy(attempts=env.int("HTTP_RETRY_ATTEMPTS", default=4))
+        self.http_client = ApiClient(
+            timeout=60, http2=self.http2, retry=self.retry, transport=transport
+        )
+        self.response_cache = caches["youtube"]
+        self.llm_batching = env.bool("LLM_BATCHING", default=False)
+        self.comment_retry_days = env.int("COMMENT_RETRY_DAYS", default=7)
+        self.comment_harvest_limit = env.int("COMMENT_HARVEST_LIMIT", default=500)
+        self.known_genre_slugs = None
         logger.info(f"🚀 Starting PlaylistManager for 📂 Playlist ID: {playlist_id}")
 
     def fetch_playlist_items(self, page_token: Optional[str] = None) -> dict:
@@ -67,9 +206,62 @@ class PlaylistManager:
         if page_token:
             params.update({"pageToken": page_token})
 
-        endpoint = f"{self.YOUTUBE_API_BASE}/playlistItems"
-        response = self.http_client.get(endpoint, params=params)
-        return response.json()
+        return self.youtube_get("playlistItems", params)
+
+    def youtube_get(self, endpoint: str, params: dict) -> dict:
+        cache_key, cached = self.cached_response(endpoint, params)
+        response = self.http_client.get(
+            f"{self.YOUTUBE_API_BASE}/{endpoint}",
+            params=params,
+            headers=self.conditional_headers(cached),
+            on_attempt=self.quota_spender(endpoint),
+        )
+        return self.handle_youtube_response(cache_key, cached, response)
+
+    def quota_spender(self, endpoint: str):
+        """Bills one attempt at ``endpoint``, as retried requests cost quota too."""
+        return functools.partial(
+            self.quota.spend, endpoint, self.QUOTA_COSTS.get(endpoint, 1)
+        )
+
+    def cached_response(
+        self, endpoint: str, params: dict
+    ) -> tuple[str, Optional[dict]]:
+        cache_params = {key: value for key, value in params.items() if key != "key"}
+        cache_key = (
+            f"{endpoint}:{self.generate_hash(json.dumps(cache_params, sort_keys=True))}"
+        )
+        return cache_key, self.response_cache.get(cache_key)
+
+    def conditional_headers(self, cached: Optional[dict]) -> dict:
+        return {"If-None-Match": cached["etag"]} if cached else {}
+
+    def handle_youtube_response(
+        self, cache_key: str, cached: Optional[dict], response: httpx.Response
+    ) -> dict:
+        if response.status_code == 304 and cached:
+            logger.info(f"♻️ Not modified, using cached response for {cache_key}")
+            self.response_cache.touch(cache_key)
+            return {**cached["data"], "notModified": True}
+
+        # Still failing after the client's retries; raise instead of parsing an
+        # error page, so nothing is cached and the page or batch is retried later
+        if response.status_code in RETRY_STATUSES or response.status_code >= 500:
+            response.raise_for_status()
+        data = response.json()
+        if response.status_code == 403 and self.is_quota_error(data):
+            self.quota.exhaust()
+            raise QuotaExceeded("YouTube reported the daily quota as exceeded")
+        if response.is_success and data.get("etag"):
+            self.response_cache.set(cache_key, {"etag": data["etag"], "data": data})
+        return data
+
+    def is_quota_error(self, data: dict) -> bool:
+        errors = data.get("error", {}).get("errors", [])
+        return any(
+            error.get("reason") in ("quotaExceeded", "dailyLimitExceeded")
+            for error in errors
+        )
 
     def parse_playlist_items(self, data: dict) -> List[PlaylistItem]:
         logger.info(f"🧩 Parsing items for 📂 Playlist ID: {self.playlist_id}")
@@ -99,140 +291,690 @@ class PlaylistManager:
             return
 
         video_ids = [video.video_id for video in playlist]
-        existing_videos = Playlist.objects.filter(video_id__in=video_ids)
-        existing_video_ids = set(existing_videos.values_list("video_id", flat=True))
+        existing_hashes = dict(
+            Playlist.objects.filter(video_id__in=video_ids).values_list(
+                "video_id", "content_hash"
+            )
+        )
 
-        creates = []
+        rows = []
         now = timezone.now()
 
         for video in playlist:
-            key_args = {
-                "video_id": video.video_id,
-                "title": video.title,
-                "description": video.description,
-                "thumbnails": video.thumbnails,
-                "position": video.position,
-                "video_owner_channel_title": video.video_owner_channel_title,
-                "video_owner_channel_id": video.video_owner_channel_id,
-                "fetched_at": now,
-            }
-
-            if video.video_id in existing_video_ids:
+            # Positions are per source, kept on the memberships
+            fields = {**asdict(video), "position": None}
+            content_hash = self.generate_hash(json.dumps(fields, sort_keys=True))
+            if existing_hashes.get(video.video_id) == content_hash:
+                continue
+
+            if video.video_id in existing_hashes:
                 logger.info(f"🔄 Updating video 🆔 {video.video_id} in DB")
-                existing_videos.filter(video_id=video.video_id).update(**key_args)
             else:
                 logger.info(f"➕ Adding video 🆔 {video.video_id} to DB")
-                creates.append(Playlist(**key_args))
 
-        if creates:
-            logger.info(f"📦 Bulk adding {len(creates)} videos to DB")
+            rows.append(
+                Playlist(
+                    video_id=video.video_id,
+                    title=video.title,
+                    description=video.description,
+                    thumbnails=video.thumbnails,
+                    position=video.position,
+                    video_owner_channel_title=video.video_owner_channel_title,
+                    video_owner_channel_id=video.video_owner_channel_id,
+                    content_hash=content_hash,
+                    fetched_at=now,
+                )
+            )
+
+        if rows:
+            logger.info(f"📦 Bulk upserting {len(rows)} videos to DB")
+            if connection.features.supports_update_conflicts_with_target:
+                Playlist.objects.bulk_create(
+                    rows,
+                    update_conflicts=True,
+                    unique_fields=["video_id"],
+                    update_fields=self.UPSERT_FIELDS,
+                )
+            else:
+                self.bulk_upsert_fallback(rows, set(existing_hashes))
+            DataVersion.objects.bump_on_commit()
+        else:
+            logger.info(f"✅ No changed videos for 📂 Playlist ID: {self.playlist_id}")
+        self.save_memberships(playlist)
+
+    def save_memberships(self, playlist: List[PlaylistItem]):
+        """Records the position of each video in this source."""
+        positions = {video.video_id: video.position for video in playlist}
+        existing = self.source.memberships.filter(
+            playlist__video_id__in=positions
+        ).annotate(video_id=F("playlist__video_id"))
+
+        updates, seen = [], set()
+        for membership in existing:
+            seen.add(membership.video_id)
+            if membership.position != positions[membership.video_id]:
+                membership.position = positions[membership.video_id]
+                updates.append(membership)
+
+        creates = []
+        if len(seen) < len(positions):
+            creates = [
+                PlaylistMembership(
+                    source=self.source, playlist_id=pk, position=positions[video_id]
+                )
+                for video_id, pk in Playlist.objects.filter(
+                    video_id__in=set(positions) - seen
+                ).values_list("video_id", "pk")
+            ]
+
+        PlaylistMembership.objects.bulk_create(creates)
+        PlaylistMembership.objects.bulk_update(updates, ["position"])
+        self.sync_playlists(
+            [membership.playlist_id for membership in creates + updates]
+        )
+
+    def sync_playlists(self, playlist_ids: list) -> int:
+        """
+        Derives the position and removal of videos from their memberships:
+        the position in the first source still listing a video, and removed
+        once no source does. A video in several sources keeps one position
+        instead of taking the one of whichever source was scanned last.
+        """
+        now = timezone.now()
+        rows = []
+        for start in range(0, len(playlist_ids), 500):
+            chunk = playlist_ids[start : start + 500]
+            memberships = {}
+            for playlist_id, position, removed_at in (
+                PlaylistMembership.objects.filter(playlist_id__in=chunk)
+                .order_by("pk")
+                .values_list("playlist_id", "position", "removed_at")
+            ):
+                memberships.setdefault(playlist_id, []).append((position, removed_at))
+
+            for playlist in Playlist.objects.filter(pk__in=chunk).only(
+                "position", "removed_at"
+            ):
+                listed = memberships.get(playlist.pk)
+                if not listed:
+                    continue
+                active = [position for position, removed_at in listed if not removed_at]
+                position = active[0] if active else listed[0][0]
+                removed_at = None if active else playlist.removed_at or now
+                if (position, removed_at) != (playlist.position, playlist.removed_at):
+                    playlist.position, playlist.removed_at = position, removed_at
+                    rows.append(playlist)
+
+        Playlist.objects.bulk_update(rows, ["position", "removed_at"], batch_size=500)
+        if rows:
+            DataVersion.objects.bump_on_commit()
+        return len(rows)
+
+    def bulk_upsert_fallback(self, rows: List[Playlist], existing_video_ids: set):
+        creates = [row for row in rows if row.video_id not in existing_video_ids]
+        updates = [row for row in rows if row.video_id in existing_video_ids]
+        primary_keys = dict(
+            Playlist.objects.filter(
+                video_id__in=[row.video_id for row in updates]
+            ).values_list("video_id", "pk")
+        )
+        for row in updates:
+            row.pk = primary_keys[row.video_id]
+
+        with transaction.atomic():
             Playlist.objects.bulk_create(creates)
+            Playlist.objects.bulk_update(updates, self.UPSERT_FIELDS)
 
     def generate_playlist(
         self, page_token: Optional[str] = None, full_scan: Optional[bool] = False
     ):
+        """
+        Walks the playlist comparing each page with the items stored from
+        the last scan. When the playlist gained or lost items, the scan stops
+        at the first page that ends in a run of stored items shifted by that
+        many: the rest of the playlist can only have shifted too, so its
+        stored positions are moved instead of fetched, and edits or moves
+        behind it are left to the next full scan. A page that is unchanged
+        while the count isn't starts a binary search of the stored page
+        tokens for the first changed page.
+
+        With the count unchanged nothing tells a move, or an insert and a
+        removal, further down from an unchanged playlist, so every page is
+        fetched; unchanged ones skip the database writes.
+        """
+        checkpoint = self.load_checkpoint(full_scan)
+        page_token = page_token or checkpoint.page_token
+        page_index = checkpoint.page_index
+        full_scan = checkpoint.full_scan
+
+        pages = {page.index: page for page in self.source.pages.all()}
+        before = self.snapshot_entries(pages.values())
+        old_items = {video_id: (position, etag) for video_id, position, etag in before}
+        item_count = self.source.item_count
+        prefetched = {}
+        tail_shift = 0
+
+        videos = (
+            self.source.memberships.filter(removed_at__isnull=True)
+            .order_by("position")
+            .values_list("playlist__video_id", flat=True)
+        )
+        first_video_id = videos.first()
+        last_video_id = videos.last()
+        reached_end = True
+
+        while True:
+            logger.info(
+                f"🛠️ Creating playlist for 📂 Playlist ID: {self.playlist_id} | Token: {page_token} | Full Scan: {full_scan}"
+            )
+            data = prefetched.pop(page_index, None) or self.fetch_playlist_items(
+                page_token
+            )
+            next_page_token = data.get("nextPageToken", None)
+            next_page_index = page_index + 1
+            playlist_items = self.parse_playlist_items(data)
+            entries = page_entries(data)
+            stored = pages.get(page_index)
+            unchanged = stored is not None and stored.fingerprint == fingerprint(
+                entries
+            )
+            total = data.get("pageInfo", {}).get("totalResults", item_count)
+            shift, aligned = self.aligned_tail(entries, old_items)
+
+            playlist_items_video_ids = [item.video_id for item in playlist_items]
+
+            if full_scan or not next_page_token:
+                pass
+            elif (
+                shift
+                and shift == total - item_count
+                and aligned >= min(self.ALIGNED_ITEMS, len(entries))
+            ):
+                logger.info(
+                    f"🧮 Rest of 📂 Playlist ID: {self.playlist_id} is unchanged, shifted by {shift}"
+                )
+                next_page_token = None
+                reached_end = False
+                tail_shift = shift
+            elif unchanged and total != item_count:
+                change = self.seek_change(pages, next_page_index, prefetched)
+                if change:
+                    next_page_index, next_page_token = change
+            elif (
+                not before
+                and first_video_id in playlist_items_video_ids
+                and last_video_id == self.source.last_video_id
+            ):
+                # Nothing stored to compare with yet, e.g. right after an upgrade
+                next_page_token = None
+                reached_end = False
+
+            if data.get("notModified") or (unchanged and not full_scan):
+                logger.info(
+                    f"♻️ Page unchanged, skipping DB update | Token: {page_token}"
+                )
+            else:
+                self.bulk_update_db(playlist_items)
+            self.update_video_metadata(playlist_items)
+            if not unchanged:
+                pages[page_index] = self.save_page(page_index, page_token, entries)
+            self.source.item_count = total
+
+            checkpoint.page_token = next_page_token
+            checkpoint.page_index = next_page_index
+            checkpoint.pages_done += 1
+            checkpoint.save(
+                update_fields=["page_token", "page_index", "pages_done", "updated_at"]
+            )
+            self.quota.flush()
+
+            if not next_page_token:
+                break
+            page_token = next_page_token
+            page_index = next_page_index
+
+        checkpoint.completed_at = timezone.now()
+        checkpoint.save(update_fields=["completed_at", "updated_at"])
+        if tail_shift:
+            self.shift_tail(pages, before, page_index, tail_shift)
+        if reached_end:
+            # The playlist may have lost pages since the last scan
+            self.source.pages.filter(index__gt=page_index).delete()
+        self.save_source_state(checkpoint, reached_end and playlist_items)
+        self.apply_diff(before)
         logger.info(
-            f"🛠️ Creating playlist for 📂 Playlist ID: {self.playlist_id} | Token: {page_token} | Full Scan: {full_scan}"
+            f"🏁 Scanned {checkpoint.pages_done} pages for 📂 Playlist ID: {self.playlist_id}"
         )
-        data = self.fetch_playlist_items(page_token)
-        next_page_token = data.get("nextPageToken", None)
-        playlist_items = self.parse_playlist_items(data)
 
-        first_video_id = Playlist.objects.first() and Playlist.objects.first().video_id
-        last_video_id = Playlist.objects.last() and Playlist.objects.last().video_id
+    def aligned_tail(self, entries: list, old_items: dict) -> tuple[int, int]:
+        """
+        Shift and length of the run of stored items, in their stored order
+        and unedited, that the page ends with.
+        """
+        shift, aligned = 0, 0
+        for video_id, position, etag in reversed(entries):
+            old = old_items.get(video_id)
+            if old is None or old[1] != etag:
+                break
+            if aligned and position - old[0] != shift:
+                break
+            shift = position - old[0]
+            aligned += 1
+        return shift, aligned
+
+    def seek_change(
+        self, pages: dict, low: int, prefetched: dict
+    ) -> Optional[tuple[int, str]]:
+        """
+        Binary search over the stored page tokens for the first page from
+        ``low`` that no longer matches its fingerprint, assuming the changes
+        are together. The last page is the fallback, as it also tells whether
+        the playlist grew. Changed pages fetched on the way are kept in
+        ``prefetched`` for the walk; None walks on page by page.
+        """
+        high = max(pages, default=-1)
+        if low > high or not all(
+            index in pages and pages[index].page_token for index in range(low, high + 1)
+        ):
+            return None
 
-        playlist_items_video_ids = [item.video_id for item in playlist_items]
+        while low < high:
+            middle = (low + high) // 2
+            data = self.fetch_playlist_items(pages[middle].page_token)
+            if "items" not in data:
+                # The stored token no longer works
+                return None
+            if fingerprint(page_entries(data)) == pages[middle].fingerprint:
+                low = middle + 1
+            else:
+                prefetched[middle] = data
+                high = middle
+        logger.info(f"🧮 Skipping to page {low}, the first that changed")
+        return low, pages[low].page_token
 
-        if (
-            first_video_id in playlist_items_video_ids
-            and not full_scan
-            and last_video_id == self.playlist_last_video_id
-        ):
-            next_page_token = None
+    def shift_tail(self, pages: dict, before: list, index: int, shift: int):
+        """
+        Moves the stored items after page ``index`` by ``shift`` positions,
+        in the page fingerprints and in the database.
+        """
+        end = (index + 1) * self.BATCH_SIZE
+        tail = [
+            (video_id, position + shift, etag)
+            for video_id, position, etag in before
+            if position + shift >= end
+        ]
+        tail_pages = {}
+        for entry in tail:
+            tail_pages.setdefault(entry[1] // self.BATCH_SIZE, []).append(entry)
+        for page_index, entries in sorted(tail_pages.items()):
+            # Tokens stand for an offset, pages new at the end have none yet
+            page = pages.get(page_index)
+            self.save_page(page_index, page.page_token if page else "", entries)
+        self.source.pages.filter(index__gt=max(tail_pages, default=index)).delete()
+
+        positions = {video_id: position for video_id, position, _ in tail}
+        rows = [
+            PlaylistMembership(
+                pk=pk, playlist_id=playlist_id, position=positions[video_id]
+            )
+            for pk, playlist_id, video_id in self.source.memberships.values_list(
+                "pk", "playlist_id", "playlist__video_id"
+            )
+            if video_id in positions
+        ]
+        logger.info(f"📦 Shifting {len(rows)} videos by {shift} positions")
+        PlaylistMembership.objects.bulk_update(rows, ["position"], batch_size=500)
+        self.sync_playlists([row.playlist_id for row in rows])
+
+    def save_page(
+        self, index: int, page_token: Optional[str], entries: list
+    ) -> PlaylistPage:
+        page, _ = PlaylistPage.objects.update_or_create(
+            source=self.source,
+            index=index,
+            defaults={
+                "page_token": page_token or "",
+                "items": entries,
+                "fingerprint": fingerprint(entries),
+            },
+        )
+        return page
 
-        self.bulk_update_db(playlist_items)
-        self.update_comments(playlist_items)
-        self.update_video_metadata(playlist_items)
+    def snapshot_entries(self, pages) -> list:
+        return [entry for page in pages for entry in page.items]
 
-        if next_page_token:
-            self.generate_playlist(next_page_token)
+    def apply_diff(self, before: list):
+        """
+        Logs what changed since the last scan and marks the videos no longer
+        in the playlist as removed, once the stored pages cover all of it.
+        """
+        pages = list(self.source.pages.order_by("index"))
+        after = self.snapshot_entries(pages)
+        changes = diff(before, after)
+        if before and changes:
+            logger.info(
+                f"🧮 Playlist changes for 📂 Playlist ID: {self.playlist_id}: {changes.summary()}"
+            )
 
-    def fetch_comments(self, video_id: str) -> dict:
-        logger.info(f"💬 Fetching comments for video 🆔 {video_id}")
+        expected = math.ceil(self.source.item_count / self.BATCH_SIZE)
+        if [page.index for page in pages] != list(range(expected)):
+            logger.info(
+                f"🧮 Stored pages don't cover 📂 Playlist ID: {self.playlist_id} yet, "
+                "removals are checked after a full scan"
+            )
+            return
+
+        present = {entry[0] for entry in after}
+        memberships = self.source.memberships.values_list(
+            "pk", "playlist_id", "playlist__video_id", "removed_at"
+        )
+        removed, restored, changed = [], [], []
+        for pk, playlist_id, video_id, removed_at in memberships:
+            if removed_at is None and video_id not in present:
+                removed.append(pk)
+            elif removed_at is not None and video_id in present:
+                restored.append(pk)
+            else:
+                continue
+            changed.append(playlist_id)
+        for pks, removed_at in ((removed, timezone.now()), (restored, None)):
+            for start in range(0, len(pks), 500):
+                PlaylistMembership.objects.filter(
+                    pk__in=pks[start : start + 500]
+                ).update(removed_at=removed_at)
+        if removed or restored:
+            logger.info(
+                f"🗑️ Marked {len(removed)} videos removed and {len(restored)} restored"
+            )
+            # Videos other sources still list stay in the catalog
+            self.sync_playlists(changed)
+
+    def save_source_state(
+        self, checkpoint: ScanCheckpoint, last_page: Optional[List[PlaylistItem]]
+    ):
+        self.source.last_scanned_at = checkpoint.completed_at
+        self.source.last_error = ""
+        if checkpoint.full_scan:
+            self.source.last_full_scan_at = checkpoint.completed_at
+        if last_page:
+            # Later scans can stop once they reach videos already stored
+            self.source.last_video_id = max(
+                last_page, key=lambda item: item.position
+            ).video_id
+        self.source.save(
+            update_fields=[
+                "last_scanned_at",
+                "last_full_scan_at",
+                "last_error",
+                "last_video_id",
+                "item_count",
+            ]
+        )
+
+    def load_checkpoint(self, full_scan: bool) -> ScanCheckpoint:
+        checkpoint, created = ScanCheckpoint.objects.get_or_create(
+            playlist_id=self.playlist_id
+        )
+
+        if not created and checkpoint.completed_at is None and checkpoint.page_token:
+            logger.info(
+                f"⏯️ Resuming scan for 📂 Playlist ID: {self.playlist_id} at page {checkpoint.pages_done + 1}"
+            )
+            checkpoint.full_scan = checkpoint.full_scan or bool(full_scan)
+        else:
+            checkpoint.page_token = None
+            checkpoint.page_index = 0
+            checkpoint.pages_done = 0
+            checkpoint.full_scan = bool(full_scan)
+            checkpoint.started_at = timezone.now()
+
+        checkpoint.completed_at = None
+        checkpoint.save()
+        return checkpoint
+
+    def comments_params(self, video_id: str, page_token: Optional[str] = None) -> dict:
         params = {
             "key": self.google_api_key,
             "part": "snippet",
-            "maxResults": 5,
+            "maxResults": self.COMMENTS_PAGE_SIZE,
             "videoId": video_id,
             "order": "relevance",
         }
-        endpoint = f"{self.YOUTUBE_API_BASE}/commentThreads"
-        response = self.http_client.get(endpoint, params=params)
-        return response.json()
+        if page_token:
+            params.update({"pageToken": page_token})
+        return params
 
-    def parse_comments(self, data: dict) -> Optional[str]:
-        log_data = (
-            data["items"][0]["snippet"]["videoId"] if data.get("items", None) else None
+    def fetch_comments(self, video_id: str, page_token: Optional[str] = None) -> dict:
+        logger.info(f"💬 Fetching comments for video 🆔 {video_id}")
+        return self.youtube_get(
+            "commentThreads", self.comments_params(video_id, page_token)
         )
-        logger.info(f"💬 Parsing comments for video 🆔 {log_data}")
+
+    def score_comments(
+        self, data: dict, harvest: CommentHarvest
+    ) -> tuple[CommentHarvest, Optional[str]]:
+        """
+        Keeps the comment the tracklist detector is most confident in, and
+        returns the token of the next page while one is worth fetching: no
+        comment was good enough yet, but some listed a few tracks, so the
+        tracklist is likely further down.
+        """
+        if "error" in data:
+            errors = data["error"].get("errors") or [{}]
+            return replace(harvest, error=errors[0].get("reason", "unknown")), None
+
+        likely = False
         for item in data.get("items", []):
             content = item["snippet"]["topLevelComment"]["snippet"]
-            is_author_youtube = content["authorDisplayName"] == "YouTube"
-            contains_track_list = self.check_comment_for_track_list(
-                content["textOriginal"]
+            if content["authorDisplayName"] == "YouTube":
+                continue
+            tracklist = extract_tracklist(content["textOriginal"])
+            if tracklist.confidence > harvest.confidence:
+                harvest = replace(
+                    harvest,
+                    comment=content["textOriginal"],
+                    confidence=tracklist.confidence,
+                )
+            likely = likely or len(tracklist.tracks) >= 2
+
+        harvest = replace(harvest, pages=harvest.pages + 1)
+        if harvest.confidence >= self.COMMENT_TRACKLIST_CONFIDENCE or not likely:
+            return harvest, None
+        return harvest, data.get("nextPageToken")
+
+    def harvest_video_comments(self, video: Playlist) -> CommentHarvest:
+        harvest, page_token = CommentHarvest(), None
+        while harvest.pages < self.COMMENTS_MAX_PAGES:
+            data = self.fetch_comments(video.video_id, page_token)
+            harvest, page_token = self.score_comments(data, harvest)
+            if not page_token:
+                break
+        return harvest
+
+    def gather_comments(self, videos: List[Playlist]) -> list:
+        results = []
+        for video in videos:
+            try:
+                results.append(self.harvest_video_comments(video))
+            except (httpx.HTTPError, QuotaExceeded) as e:
+                results.append(e)
+                if isinstance(e, QuotaExceeded):
+                    break
+        return results
+
+    def harvest_comments(self):
+        """
+        Looks for a tracklist in the comments of the source's videos that
+        need one: new videos, and earlier misses whose retry time has come.
+        """
+        videos = self.due_comment_videos()
+        logger.info(
+            f"💬 Harvesting comments of {len(videos)} videos for 📂 Playlist ID: {self.playlist_id}"
+        )
+        for start in range(0, len(videos), self.COMMENTS_CHUNK_SIZE):
+            chunk = videos[start : start + self.COMMENTS_CHUNK_SIZE]
+            results = self.gather_comments(chunk)
+            self.save_comment_harvests(chunk, results)
+            self.quota.flush()
+            self.raise_quota_exceeded(results)
+
+    def due_comment_videos(self) -> List[Playlist]:
+        """
+        Videos due for a comment harvest, the ones never looked at first, up
+        to COMMENT_HARVEST_LIMIT. Videos whose description already has a
+        tracklist are put off instead, as their comments wouldn't be used.
+        """
+        now = timezone.now()
+        due = (
+            Playlist.objects.filter(
+                memberships__source=self.source, memberships__removed_at__isnull=True
+            )
+            .filter(
+                Q(helpful_comment__isnull=True)
+                | Q(helpful_comment="", comments_retry_at__isnull=True)
+                | Q(helpful_comment="", comments_retry_at__lte=now)
             )
-            if not is_author_youtube and contains_track_list:
-                return content["textOriginal"]
-        return None
+            .order_by(F("comments_fetched_at").asc(nulls_first=True), "position")
+        )
 
-    def check_comment_for_track_list(self, comment: str) -> bool:
-        pattern = r"\w+ - \w"
-        return len(re.findall(pattern, comment)) >= 3
+        videos, described = [], []
+        for video in due.iterator():
+            tracklist = extract_tracklist(video.description)
+            if tracklist.confidence >= self.LOCAL_TRACKLIST_CONFIDENCE:
+                video.helpful_comment = ""
+                video.comments_retry_at = now + timedelta(
+                    days=self.COMMENT_RETRY_MAX_DAYS
+                )
+                described.append(video)
+            elif len(videos) < self.comment_harvest_limit:
+                videos.append(video)
+            else:
+                break
 
-    def update_comments(self, playlist: List[PlaylistItem]):
-        logger.info(f"💬 Updating comments for 📂 Playlist ID: {self.playlist_id}")
-        video_ids = [item.video_id for item in playlist]
-        existing_videos = Playlist.objects.filter(
-            video_id__in=video_ids, helpful_comment__isnull=True
+        Playlist.objects.bulk_update(
+            described, ["helpful_comment", "comments_retry_at"], batch_size=500
         )
+        if described:
+            DataVersion.objects.bump_on_commit()
+        return videos
+
+    def comments_retry_at(self, video: Playlist, now, gone: bool = False):
+        """A miss waits COMMENT_RETRY_DAYS, twice as long as before when it misses again."""
+        longest = timedelta(days=self.COMMENT_RETRY_MAX_DAYS)
+        if gone:
+            return now + longest
+        wait = timedelta(days=self.comment_retry_days)
+        if video.comments_fetched_at and video.comments_retry_at:
+            wait = max(wait, 2 * (video.comments_retry_at - video.comments_fetched_at))
+        return now + min(wait, longest)
+
+    def save_comment_harvests(self, videos: List[Playlist], results: list):
+        now = timezone.now()
+        updates, changed = [], False
+        for video, result in zip(videos, results):
+            if isinstance(result, QuotaExceeded):
+                continue
+            if isinstance(result, Exception):
+                logger.error(
+                    f"❌ Failed to fetch comments for video 🆔 {video.video_id}: {result}"
+                )
+                continue
+            gone = result.error in self.COMMENTS_GONE_REASONS
+            if result.error and not gone:
+                logger.error(
+                    f"❌ YouTube didn't list comments for video 🆔 {video.video_id}: {result.error}"
+                )
+                continue
 
-        for video in existing_videos:
-            comments = self.fetch_comments(video.video_id)
-            helpful_comment = self.parse_comments(comments)
-            video.helpful_comment = helpful_comment or ""
-            video.save(update_fields=["helpful_comment"])
+            found = result.confidence >= self.COMMENT_TRACKLIST_CONFIDENCE
+            video.comments_retry_at = (
+                None if found else self.comments_retry_at(video, now, gone)
+            )
+            video.comments_fetched_at = now
+            comment = result.comment if found else ""
+            changed = changed or comment != (video.helpful_comment or "")
+            video.helpful_comment = comment
+            updates.append(video)
 
-    def fetch_video_metadata(self, video_id: str) -> dict:
-        logger.info(f"⏳ Fetching video metadata for video 🆔 {video_id}")
-        params = {
+        found = sum(1 for video in updates if video.helpful_comment)
+        logger.info(
+            f"💬 Found tracklists in the comments of {found} of {len(updates)} videos"
+        )
+        Playlist.objects.bulk_update(
+            updates,
+            ["helpful_comment", "comments_fetched_at", "comments_retry_at"],
+            batch_size=500,
+        )
+        # Retry dates alone don't show on any page
+        if changed:
+            DataVersion.objects.bump_on_commit()
+
+    def raise_quota_exceeded(self, results: list):
+        """Stops the scan once the requests that did succeed are saved."""
+        for result in results:
+            if isinstance(result, QuotaExceeded):
+                raise result
+
+    def video_metadata_params(self, video_ids: List[str]) -> dict:
+        return {
             "key": self.google_api_key,
             "part": "contentDetails,snippet",
-            "id": video_id,
+            "id": ",".join(video_ids),
+            "maxResults": self.BATCH_SIZE,
         }
-        endpoint = f"{self.YOUTUBE_API_BASE}/videos"
-        response = self.http_client.get(endpoint, params=params)
-        return response.json()
+
+    def fetch_video_metadata(self, video_ids: List[str]) -> dict:
+        logger.info(f"⏳ Fetching video metadata for {len(video_ids)} videos")
+        return self.youtube_get("videos", self.video_metadata_params(video_ids))
 
     def update_video_metadata(self, playlist: List[PlaylistItem]):
         logger.info(
             f"⏳ Updating video metadata for 📂 Playlist ID: {self.playlist_id}"
         )
         video_ids = [item.video_id for item in playlist]
-        existing_videos = Playlist.objects.filter(
-            video_id__in=video_ids, duration__isnull=True
+        existing_videos = list(
+            Playlist.objects.filter(video_id__in=video_ids, duration__isnull=True)
         )
 
-        for video in existing_videos:
-            response = self.fetch_video_metadata(video.video_id)
-            duration = isodate.parse_duration(
-                response["items"][0]["contentDetails"]["duration"]
-            )
-            published_at = isodate.parse_datetime(
-                response["items"][0]["snippet"]["publishedAt"]
-            )
-            video.duration = duration
-            video.published_at = published_at
-            video.save(update_fields=["duration", "published_at"])
+        responses = []
+        for batch in self.batched_video_ids(existing_videos):
+            try:
+                responses.append(self.fetch_video_metadata(batch))
+            except httpx.HTTPError as e:
+                logger.error(f"❌ Failed to fetch video metadata: {e}")
+        self.save_video_metadata(existing_videos, responses)
+
+    def batched_video_ids(self, videos: List[Playlist]) -> List[List[str]]:
+        video_ids = [video.video_id for video in videos]
+        return [
+            video_ids[start : start + self.BATCH_SIZE]
+            for start in range(0, len(video_ids), self.BATCH_SIZE)
+        ]
+
+    def save_video_metadata(self, videos: List[Playlist], responses: List[dict]):
+        items = {
+            item["id"]: item
+            for response in responses
+            for item in response.get("items", [])
+        }
+
+        updates = []
+        for video in videos:
+            item = items.get(video.video_id)
+            if item is None:
+                logger.warning(f"⚠️ No video metadata for video 🆔 {video.video_id}")
+                continue
+            self.apply_video_metadata(video, item)
+            updates.append(video)
+
+        if updates:
+            logger.info(f"📦 Bulk updating metadata for {len(updates)} videos")
+            Playlist.objects.bulk_update(updates, ["duration", "published_at"])
+            DataVersion.objects.bump_on_commit()
+
+    def apply_video_metadata(self, video: Playlist, item: dict):
+        video.duration = isodate.parse_duration(item["contentDetails"]["duration"])
+        video.published_at = isodate.parse_datetime(item["snippet"]["publishedAt"])
 
     def parse_metadata(self, response: dict) -> PlaylistMetadata:
         logger.info(f"📜 Parsing metadata for 📂 Playlist ID: {self.playlist_id}")
@@ -283,16 +1025,15 @@ class PlaylistManager:
 
         return result or None
 
-    def fetch_metadata(self, playlist: Playlist) -> PlaylistMetadata:
-        logger.info(f"📜 Fetching metadata for playlist {playlist.title}")
-
-        prompt = f"""
+    def metadata_prompt(self, playlist: Playlist) -> str:
+        return f"""
         title: {playlist.title}
         description: {playlist.description}
         helpful comment: {playlist.helpful_comment}
         """
 
-        context = """
+    def metadata_context(self) -> str:
+        return """
         You are an AI designed to extract relevant information from playlist metadata. Your task is to extract song genres and track details from the provided playlist data. Follow these guidelines:
 
         1. **Genres:**
@@ -330,12 +1071,71 @@ class PlaylistManager:
            - Ensure your output is always a valid minified JSON.
         """
 
-        payload = {
+    def metadata_messages(self, playlist: Playlist) -> List[dict]:
+        return [
+            {"role": "system", "content": self.metadata_context()},
+            {"role": "user", "content": self.metadata_prompt(playlist)},
+        ]
+
+    def batch_metadata_messages(self, playlists: List[Playlist]) -> List[dict]:
+        context = (
+            self.metadata_context()
+            + """
+        5. **Multiple Videos:**
+           - The playlist data contains several videos, each introduced by its video_id.
+           - Return one minified JSON object keyed by video_id, where each value matches the format above.
+           - Include every video_id from the input, using an empty object when nothing can be extracted.
+        """
+        )
+        prompt = "\n".join(
+            f"video_id: {playlist.video_id}{self.metadata_prompt(playlist)}"
+            for playlist in playlists
+        )
+        return [
+            {"role": "system", "content": context},
+            {"role": "user", "content": prompt},
+        ]
+
+    def genre_messages(self, playlist: Playlist) -> List[dict]:
+        context = """
+        You are an AI designed to extract relevant information from playlist metadata. Your task is to name the song genres of the provided playlist data. Follow these guidelines:
+
+        1. Extract or infer no more than 5 genres from the playlist.
+        2. Only include genres if you can confidently determine them.
+        3. Always return a valid minified JSON object of the form {"genres": string[]}, with an empty list when the genres are unclear.
+        """
+        prompt = f"""
+        title: {playlist.title}
+        description: {playlist.description}
+        """
+        return [
+            {"role": "system", "content": context},
+            {"role": "user", "content": prompt},
+        ]
+
+    def estimate_tokens(self, text: str) -> int:
+        return len(text) // 4 + 1
+
+    def metadata_batches(self, playlists: List[Playlist]) -> List[List[Playlist]]:
+        batches, batch, budget = [], [], 0
+        for playlist in playlists:
+            tokens = self.estimate_tokens(self.metadata_prompt(playlist))
+            if batch and (
+                budget + tokens > self.LLM_BATCH_TOKEN_BUDGET
+                or len(batch) >= self.LLM_BATCH_MAX_VIDEOS
+            ):
+                batches.append(batch)
+                batch, budget = [], 0
+            batch.append(playlist)
+            budget += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def metadata_payload(self, messages: List[dict]) -> dict:
+        return {
             "model": self.AI_MODEL,
-            "messages": [
-                {"role": "system", "content": context},
-                {"role": "user", "content": prompt},
-            ],
+            "messages": messages,
             "provider": {"allow_fallbacks": False},
             "response_format": {"type": "json_object"},
             "top_p": 0.8,
@@ -346,22 +1146,113 @@ class PlaylistManager:
             "top_k": 0,
         }
 
-        headers = {
+    def openrouter_headers(self) -> dict:
+        return {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.openrouter_api_key}",
         }
 
+    def fetch_metadata(self, playlist: Playlist) -> PlaylistMetadata:
+        logger.info(f"📜 Fetching metadata for playlist {playlist.title}")
+        payload = self.metadata_payload(self.metadata_messages(playlist))
+        cache_key = self.metadata_cache_key(payload)
+        cached = self.cached_metadata(cache_key)
+        if cached:
+            return cached
+
+        response = self.http_client.post(
+            self.OPENROUTER_API_BASE,
+            headers=self.openrouter_headers(),
+            json=payload,
+            timeout=300,
+        )
+        content, metadata = self.parse_metadata_response(response)
+        self.cache_metadata(cache_key, content, metadata)
+        return metadata
+
+    def fetch_genres(self, playlist: Playlist) -> Optional[List[str]]:
+        logger.info(f"🎭 Fetching genres for playlist {playlist.title}")
+        cache_key = self.genre_cache_key(playlist)
+        cached = self.cached_metadata(cache_key)
+        if cached:
+            return cached.genres
+
+        payload = self.metadata_payload(self.genre_messages(playlist))
+        response = self.http_client.post(
+            self.OPENROUTER_API_BASE,
+            headers=self.openrouter_headers(),
+            json=payload,
+            timeout=300,
+        )
+        content, metadata = self.parse_metadata_response(response)
+        self.cache_metadata(cache_key, content, replace(metadata, tracks=None))
+        return metadata.genres
+
+    def fill_genres(
+        self, results: List[tuple[Playlist, PlaylistMetadata]]
+    ) -> List[tuple[Playlist, PlaylistMetadata]]:
+        """
+        Asks the LLM for the genres of locally parsed playlists whose
+        hashtags named no known genre. Once saved with songs a playlist is
+        no longer pending, so playlists whose request fails are left out
+        and tried again on the next run.
+        """
+        filled = []
+        for playlist, metadata in results:
+            if not metadata.genres:
+                try:
+                    metadata = replace(metadata, genres=self.fetch_genres(playlist))
+                except Exception as e:
+                    logger.error(
+                        f"❌ Failed to fetch genres for video {playlist.title}: {e}"
+                    )
+                    continue
+            filled.append((playlist, metadata))
+        return filled
+
+    def fetch_batch_metadata(
+        self, playlists: List[Playlist]
+    ) -> dict[str, tuple[str, PlaylistMetadata]]:
+        logger.info(f"📚 Fetching metadata for {len(playlists)} playlists in one batch")
+        payload = self.metadata_payload(self.batch_metadata_messages(playlists))
+        response = self.http_client.post(
+            self.OPENROUTER_API_BASE,
+            headers=self.openrouter_headers(),
+            json=payload,
+            timeout=300,
+        )
+        return self.parse_batch_metadata_response(response, playlists)
+
+    def parse_metadata_response(
+        self, response: httpx.Response
+    ) -> tuple[str, PlaylistMetadata]:
+        content, message_data = self.parse_completion(response)
+        return content, self.parse_metadata(message_data)
+
+    def parse_batch_metadata_response(
+        self, response: httpx.Response, playlists: List[Playlist]
+    ) -> dict[str, tuple[str, PlaylistMetadata]]:
+        _, message_data = self.parse_completion(response)
+        if not isinstance(message_data, dict):
+            return {}
+
+        results = {}
+        for playlist in playlists:
+            item = message_data.get(playlist.video_id)
+            if isinstance(item, (dict, list)):
+                results[playlist.video_id] = (
+                    json.dumps(item),
+                    self.parse_metadata(item),
+                )
+        return results
+
+    def parse_completion(self, response: httpx.Response) -> tuple[str, dict | list]:
         try:
-            response = self.http_client.post(
-                self.OPENROUTER_API_BASE, headers=headers, json=payload, timeout=300
-            )
             response.raise_for_status()
 
-            message_data = json.loads(
-                response.json()["choices"][0]["message"]["content"]
-            )
+            content = response.json()["choices"][0]["message"]["content"]
 
-            return self.parse_metadata(message_data)
+            return content, json.loads(content)
 
         except (json.JSONDecodeError, KeyError) as e:
             raise Exception(
@@ -378,64 +1269,275 @@ class PlaylistManager:
                 f"Unexpected error: {str(e)}. Response: {response.text.strip()}"
             )
 
+    def metadata_cache_key(self, payload: dict) -> str:
+        return self.generate_hash(json.dumps(payload, sort_keys=True), 64)
+
+    def playlist_cache_key(self, playlist: Playlist) -> str:
+        return self.metadata_cache_key(
+            self.metadata_payload(self.metadata_messages(playlist))
+        )
+
+    def genre_cache_key(self, playlist: Playlist) -> str:
+        return self.metadata_cache_key(
+            self.metadata_payload(self.genre_messages(playlist))
+        )
+
+    def cached_metadata(self, cache_key: str) -> Optional[PlaylistMetadata]:
+        entry = LLMResponse.objects.lookup(cache_key)
+        if entry is None:
+            return None
+
+        logger.info(f"♻️ Using cached metadata 🔑 {cache_key[:12]}")
+        tracks = entry.parsed.get("tracks")
+        return PlaylistMetadata(
+            genres=entry.parsed.get("genres"),
+            tracks=[Track(**track) for track in tracks] if tracks else None,
+        )
+
+    def cache_metadata(self, cache_key: str, content: str, metadata: PlaylistMetadata):
+        LLMResponse.objects.store(
+            cache_key, model=self.AI_MODEL, content=content, parsed=asdict(metadata)
+        )
+
     def generate(self):
         logger.info(f"📈 Generating data for 📂 Playlist ID: {self.playlist_id}")
-        playlists = (
-            Playlist.objects.filter(Q(genres__isnull=True) | Q(songs__isnull=True))
-            .order_by("-position")
-            .distinct()
-        )
+        if self.llm_batching:
+            self.generate_batched()
+            return
+
+        for playlist in self.pending_playlists():
+            logger.info(f"🎬 Generating data for video {playlist.title}")
+            local = self.local_metadata(playlist)
+            if local:
+                self.save_metadata_batch(self.fill_genres([(playlist, local)]))
+            else:
+                self.save_metadata(playlist, self.fetch_metadata(playlist))
+
+        LLMResponse.objects.evict()
+
+    def generate_batched(self):
+        misses = self.save_known_metadata(list(self.pending_playlists()))
+
+        for batch in self.metadata_batches(misses):
+            results = {}
+            if len(batch) > 1:
+                try:
+                    results = self.fetch_batch_metadata(batch)
+                except Exception as e:
+                    logger.error(f"❌ Batched metadata request failed: {e}")
+
+            for playlist in self.save_batch_metadata(batch, results):
+                logger.info(f"🎬 Generating data for video {playlist.title}")
+                metadata = self.fetch_metadata(playlist)
+                self.save_metadata(playlist, metadata)
+
+        LLMResponse.objects.evict()
+
+    def save_known_metadata(self, playlists: List[Playlist]) -> List[Playlist]:
+        misses, local, cached = [], [], []
         for playlist in playlists:
-            if playlist.genres.exists() or playlist.songs.exists():
-                logger.info(f"⏭️ Skipping existing video {playlist.title}")
+            metadata = self.local_metadata(playlist)
+            if metadata:
+                local.append((playlist, metadata))
+            else:
+                metadata = self.cached_metadata(self.playlist_cache_key(playlist))
+                if metadata is None:
+                    misses.append(playlist)
+                    continue
+                cached.append((playlist, metadata))
+            logger.info(f"🎬 Generating data for video {playlist.title}")
 
+        self.save_metadata_batch(self.fill_genres(local) + cached)
+        return misses
+
+    def save_batch_metadata(
+        self,
+        playlists: List[Playlist],
+        results: dict[str, tuple[str, PlaylistMetadata]],
+    ) -> List[Playlist]:
+        leftovers, parsed = [], []
+        for playlist in playlists:
+            if playlist.video_id not in results:
+                leftovers.append(playlist)
                 continue
 
+            content, metadata = results[playlist.video_id]
+            cache_key = self.playlist_cache_key(playlist)
+            self.cache_metadata(cache_key, content, metadata)
             logger.info(f"🎬 Generating data for video {playlist.title}")
-            metadata = self.fetch_metadata(playlist)
+            parsed.append((playlist, metadata))
 
-            if metadata.genres and not playlist.genres.exists():
+        self.save_metadata_batch(parsed)
+
+        if leftovers and len(playlists) > 1:
+            logger.info(
+                f"↩️ Falling back to single requests for {len(leftovers)} playlists"
+            )
+        return leftovers
+
+    def pending_playlists(self):
+        return (
+            Playlist.objects.filter(
+                memberships__source=self.source,
+                genres__isnull=True,
+                songs__isnull=True,
+            )
+            .order_by("-position")
+            .distinct()
+        )
+
+    def save_metadata(self, playlist: Playlist, metadata: PlaylistMetadata):
+        self.save_metadata_batch([(playlist, metadata)])
+
+    def save_metadata_batch(self, results: List[tuple[Playlist, PlaylistMetadata]]):
+        genres, songs = {}, {}
+        genre_links, song_links = [], []
+
+        for playlist, metadata in results:
+            if metadata.genres:
                 logger.info(
                     f"🎭 Updating genres for {playlist.title}: {', '.join(metadata.genres)}"
                 )
                 for genre in metadata.genres:
-                    name_cleaned = (
-                        genre.strip()
-                        .lower()
-                        .replace("#", "")
-                        .replace("lofi", "lo-fi")
-                        .replace("lo fi", "lo-fi")
-                        .replace("hiphop", "hip-hop")
-                        .replace("hip hop", "hip-hop")
-                        .replace("r&b", "rnb")
-                    )
-                    genre_obj, _ = Genre.objects.update_or_create(
-                        slug=slugify(name_cleaned)
-                        or self.generate_hash(name_cleaned, 16),
-                        defaults={"name": name_cleaned},
-                    )
-                    playlist.genres.add(genre_obj, through_defaults={})
+                    name_cleaned = self.clean_genre_name(genre)
+                    slug = self.genre_slug(name_cleaned)
+                    genres.setdefault(slug, Genre(slug=slug, name=name_cleaned))
+                    genre_links.append((playlist, slug))
 
-            if metadata.tracks and not playlist.songs.exists():
+            if metadata.tracks:
                 logger.info(
                     f"🎶 Updating tracks for {playlist.title}:\n  🎵 "
                     + "\n  🎵 ".join(
                         [f"{song.title} - {song.artist}" for song in metadata.tracks]
                     )
                 )
-                for song in metadata.tracks:
+                for index, song in enumerate(metadata.tracks):
                     slug_base = f"{song.artist or ''} {song.title or ''}"
                     slug = slugify(slug_base) or self.generate_hash(slug_base, 16)
-                    song_obj, _ = Song.objects.update_or_create(
-                        slug=slug,
-                        defaults={
-                            "title": song.title,
-                            "artist": song.artist,
-                        },
+                    # Spellings of an already known song resolve to it
+                    key = song_key(song.artist, song.title) or slug
+                    songs.setdefault(
+                        key,
+                        Song(slug=slug, key=key, title=song.title, artist=song.artist),
                     )
-                    playlist.songs.add(
-                        song_obj, through_defaults={"position": song.timestamp}
+                    song_links.append((playlist, key, song.timestamp, index))
+
+        if not genres and not songs:
+            return
+
+        with transaction.atomic():
+            Genre.objects.bulk_create(genres.values(), ignore_conflicts=True)
+            song_ids = Song.objects.resolve(songs)
+            new_songs = [song for key, song in songs.items() if key not in song_ids]
+            Song.objects.bulk_create(new_songs, ignore_conflicts=True)
+            genre_ids = dict(
+                Genre.objects.filter(slug__in=genres).values_list("slug", "pk")
+            )
+            slug_ids = dict(
+                Song.objects.filter(
+                    slug__in=[song.slug for song in new_songs]
+                ).values_list("slug", "pk")
+            )
+            for song in new_songs:
+                if song.slug in slug_ids:
+                    song_ids[song.key] = slug_ids[song.slug]
+
+            # Only links that don't exist yet bump the playlist counts
+            playlist_ids = {playlist.pk for playlist, _ in results}
+            new_genre_links = {
+                (playlist.pk, genre_ids[slug])
+                for playlist, slug in genre_links
+                if slug in genre_ids
+            } - set(
+                PlaylistGenre.objects.filter(playlist_id__in=playlist_ids).values_list(
+                    "playlist_id", "genre_id"
+                )
+            )
+            new_song_links = {}
+            for playlist, key, timestamp, index in song_links:
+                if key in song_ids:
+                    new_song_links.setdefault(
+                        (playlist.pk, song_ids[key]),
+                        PlaylistSong(
+                            playlist_id=playlist.pk,
+                            song_id=song_ids[key],
+                            position=timestamp,
+                            offset_seconds=parse_offset(timestamp),
+                            track_index=index,
+                        ),
                     )
+            for key in PlaylistSong.objects.filter(
+                playlist_id__in=playlist_ids
+            ).values_list("playlist_id", "song_id"):
+                new_song_links.pop(key, None)
+
+            PlaylistGenre.objects.bulk_create(
+                [
+                    PlaylistGenre(playlist_id=playlist_id, genre_id=genre_id)
+                    for playlist_id, genre_id in new_genre_links
+                ],
+                ignore_conflicts=True,
+            )
+            PlaylistSong.objects.bulk_create(
+                new_song_links.values(), ignore_conflicts=True
+            )
+            Genre.objects.increment_playlist_counts(
+                Counter(genre_id for _, genre_id in new_genre_links)
+            )
+            Song.objects.increment_playlist_counts(
+                Counter(song_id for _, song_id in new_song_links)
+            )
+            DataVersion.objects.bump_on_commit()
+
+    def clean_genre_name(self, genre: str) -> str:
+        return (
+            genre.strip()
+            .lower()
+            .replace("#", "")
+            .replace("lofi", "lo-fi")
+            .replace("lo fi", "lo-fi")
+            .replace("hiphop", "hip-hop")
+            .replace("hip hop", "hip-hop")
+            .replace("r&b", "rnb")
+        )
+
+    def genre_slug(self, name_cleaned: str) -> str:
+        return slugify(name_cleaned) or self.generate_hash(name_cleaned, 16)
+
+    def local_metadata(self, playlist: Playlist) -> Optional[PlaylistMetadata]:
+        tracklist = max(
+            (
+                extract_tracklist(playlist.helpful_comment),
+                extract_tracklist(playlist.description),
+            ),
+            key=lambda tracklist: tracklist.confidence,
+        )
+        if tracklist.confidence < self.LOCAL_TRACKLIST_CONFIDENCE:
+            return None
+
+        logger.info(
+            f"🧮 Parsed {len(tracklist.tracks)} tracks locally for {playlist.title} (confidence {tracklist.confidence})"
+        )
+        return PlaylistMetadata(
+            genres=self.local_genres(playlist), tracks=tracklist.tracks
+        )
+
+    def local_genres(self, playlist: Playlist) -> Optional[List[str]]:
+        if self.known_genre_slugs is None:
+            self.known_genre_slugs = set(Genre.objects.values_list("slug", flat=True))
+
+        hashtags = re.findall(
+            r"#([\w-]+)", f"{playlist.title} {playlist.description or ''}"
+        )
+        genres = []
+        for hashtag in hashtags:
+            name_cleaned = self.clean_genre_name(hashtag)
+            if (
+                self.genre_slug(name_cleaned) in self.known_genre_slugs
+                and name_cleaned not in genres
+            ):
+                genres.append(name_cleaned)
+        return genres[:5] or None
 
     def get_last_thumbnail(self, thumbnails: dict) -> str:
         if not thumbnails.keys():
@@ -447,8 +1549,378 @@ class PlaylistManager:
         hex_digest = hash_object.hexdigest()
         return hex_digest[:length]
 
+    def close(self):
+        self.http_client.close()
+
+
+class RateLimiter:
+    """
+    Spaces out requests so that at most ``rate`` of them start per second,
+    across every worker thread and event loop that shares it.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate else 0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    async def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+rate_limiters: dict[str, RateLimiter] = {}
+rate_limiters_lock = threading.Lock()
+
+
+def rate_limiter(endpoint: str, rate: float) -> RateLimiter:
+    """The limiter of ``endpoint``, shared by every manager in the process."""
+    with rate_limiters_lock:
+        if endpoint not in rate_limiters:
+            rate_limiters[endpoint] = RateLimiter(rate)
+        return rate_limiters[endpoint]
+
+
+class AsyncPlaylistManager(PlaylistManager):
+    """
+    PlaylistManager that fans out comment, video metadata and LLM requests
+    over an ``httpx.AsyncClient``. Pages are still walked one at a time and
+    every database write happens in bulk once a batch of requests completes.
+
+    Each manager keeps one event loop and one client for all its batches,
+    so connections are reused until close().
+    """
+
+    # Requests per second for each endpoint, shared by all workers.
+    RATE_LIMITS = {
+        "commentThreads": 10,
+        "videos": 10,
+        "openrouter": 2,
+    }
+    # Playlists sent to the LLM before their results are written to the DB.
+    GENERATE_CHUNK_SIZE = 32
+
+    def __init__(
+        self,
+        playlist_id: str,
+        concurrency: int = 8,
+        transport: Optional[httpx.MockTransport] = None,
+        quota: Optional[QuotaBudget] = None,
+    ):
+        super().__init__(playlist_id, transport=transport, quota=quota)
+        self.concurrency = concurrency
+        self.rate_limiters = {
+            endpoint: rate_limiter(endpoint, rate)
+            for endpoint, rate in self.RATE_LIMITS.items()
+        }
+        self.loop = asyncio.new_event_loop()
+        self.semaphore = None
+        self.async_client = None
+        logger.info(f"⚡ Async mode enabled with concurrency {concurrency}")
+
+    def gather(self, coroutine_function, items: list) -> list:
+        async def session():
+            if self.async_client is None:
+                self.semaphore = asyncio.Semaphore(self.concurrency)
+                limits = httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency,
+                    keepalive_expiry=30,
+                )
+                self.async_client = AsyncApiClient(
+                    timeout=60,
+                    limits=limits,
+                    http2=self.http2,
+                    retry=self.retry,
+                    transport=self.transport,
+                )
+            return await asyncio.gather(
+                *(coroutine_function(item) for item in items),
+                return_exceptions=True,
+            )
+
+        if not items:
+            return []
+        return self.loop.run_until_complete(session())
+
+    def close(self):
+        if self.async_client is not None:
+            self.loop.run_until_complete(self.async_client.aclose())
+            self.async_client = None
+        self.loop.run_until_complete(self.loop.shutdown_default_executor())
+        self.loop.close()
+        super().close()
+
+    async def request(self, endpoint: str, method: str, url: str, **kwargs):
+        async with self.semaphore:
+            await self.rate_limiters[endpoint].wait()
+            return await self.async_client.request(method, url, **kwargs)
+
+    async def ayoutube_get(self, endpoint: str, params: dict) -> dict:
+        # The response cache is on disk, keep its reads and writes off the loop
+        cache_key, cached = await asyncio.to_thread(
+            self.cached_response, endpoint, params
+        )
+        response = await self.request(
+            endpoint,
+            "GET",
+            f"{self.YOUTUBE_API_BASE}/{endpoint}",
+            params=params,
+            headers=self.conditional_headers(cached),
+            on_attempt=self.quota_spender(endpoint),
+        )
+        return await asyncio.to_thread(
+            self.handle_youtube_response, cache_key, cached, response
+        )
+
+    async def afetch_comments(
+        self, video_id: str, page_token: Optional[str] = None
+    ) -> dict:
+        logger.info(f"💬 Fetching comments for video 🆔 {video_id}")
+        return await self.ayoutube_get(
+            "commentThreads", self.comments_params(video_id, page_token)
+        )
+
+    async def aharvest_video_comments(self, video: Playlist) -> CommentHarvest:
+        harvest, page_token = CommentHarvest(), None
+        while harvest.pages < self.COMMENTS_MAX_PAGES:
+            data = await self.afetch_comments(video.video_id, page_token)
+            harvest, page_token = self.score_comments(data, harvest)
+            if not page_token:
+                break
+        return harvest
+
+    def gather_comments(self, videos: List[Playlist]) -> list:
+        return self.gather(self.aharvest_video_comments, videos)
+
+    async def afetch_video_metadata(self, video_ids: List[str]) -> dict:
+        logger.info(f"⏳ Fetching video metadata for {len(video_ids)} videos")
+        return await self.ayoutube_get("videos", self.video_metadata_params(video_ids))
+
+    async def afetch_metadata(self, playlist: Playlist) -> tuple[str, PlaylistMetadata]:
+        logger.info(f"📜 Fetching metadata for playlist {playlist.title}")
+        payload = self.metadata_payload(self.metadata_messages(playlist))
+        response = await self.request(
+            "openrouter",
+            "POST",
+            self.OPENROUTER_API_BASE,
+            headers=self.openrouter_headers(),
+            json=payload,
+            timeout=300,
+        )
+        return self.parse_metadata_response(response)
+
+    async def afetch_genres(self, playlist: Playlist) -> tuple[str, PlaylistMetadata]:
+        logger.info(f"🎭 Fetching genres for playlist {playlist.title}")
+        payload = self.metadata_payload(self.genre_messages(playlist))
+        response = await self.request(
+            "openrouter",
+            "POST",
+            self.OPENROUTER_API_BASE,
+            headers=self.openrouter_headers(),
+            json=payload,
+            timeout=300,
+        )
+        return self.parse_metadata_response(response)
+
+    def fill_genres(
+        self, results: List[tuple[Playlist, PlaylistMetadata]]
+    ) -> List[tuple[Playlist, PlaylistMetadata]]:
+        filled, asking = [], []
+        for playlist, metadata in results:
+            if not metadata.genres:
+                cache_key = self.genre_cache_key(playlist)
+                cached = self.cached_metadata(cache_key)
+                if cached is None:
+                    asking.append((playlist, metadata, cache_key))
+                    continue
+                metadata = replace(metadata, genres=cached.genres)
+            filled.append((playlist, metadata))
+
+        fetched = self.gather(
+            self.afetch_genres, [playlist for playlist, _, _ in asking]
+        )
+        for (playlist, metadata, cache_key), result in zip(asking, fetched):
+            if isinstance(result, Exception):
+                logger.error(
+                    f"❌ Failed to fetch genres for video {playlist.title}: {result}"
+                )
+                continue
+            content, genres = result
+            self.cache_metadata(cache_key, content, replace(genres, tracks=None))
+            filled.append((playlist, replace(metadata, genres=genres.genres)))
+        return filled
+
+    async def afetch_batch_metadata(
+        self, playlists: List[Playlist]
+    ) -> dict[str, tuple[str, PlaylistMetadata]]:
+        logger.info(f"📚 Fetching metadata for {len(playlists)} playlists in one batch")
+        payload = self.metadata_payload(self.batch_metadata_messages(playlists))
+        response = await self.request(
+            "openrouter",
+            "POST",
+            self.OPENROUTER_API_BASE,
+            headers=self.openrouter_headers(),
+            json=payload,
+            timeout=300,
+        )
+        return self.parse_batch_metadata_response(response, playlists)
+
+    def update_video_metadata(self, playlist: List[PlaylistItem]):
+        logger.info(
+            f"⏳ Updating video metadata for 📂 Playlist ID: {self.playlist_id}"
+        )
+        video_ids = [item.video_id for item in playlist]
+        existing_videos = list(
+            Playlist.objects.filter(video_id__in=video_ids, duration__isnull=True)
+        )
+        results = self.gather(
+            self.afetch_video_metadata, self.batched_video_ids(existing_videos)
+        )
+
+        responses = []
+        for result in results:
+            if isinstance(result, QuotaExceeded):
+                continue
+            if isinstance(result, Exception) or "items" not in result:
+                logger.error(f"❌ Failed to fetch video metadata: {result}")
+                continue
+            responses.append(result)
+
+        self.save_video_metadata(existing_videos, responses)
+        self.raise_quota_exceeded(results)
+
+    def generate(self):
+        logger.info(f"📈 Generating data for 📂 Playlist ID: {self.playlist_id}")
+        playlists = list(self.pending_playlists())
+
+        for start in range(0, len(playlists), self.GENERATE_CHUNK_SIZE):
+            chunk = playlists[start : start + self.GENERATE_CHUNK_SIZE]
+            misses = self.save_known_metadata(chunk)
+
+            if self.llm_batching:
+                batches = [
+                    batch for batch in self.metadata_batches(misses) if len(batch) > 1
+                ]
+                batch_results = {}
+                for result in self.gather(self.afetch_batch_metadata, batches):
+                    if isinstance(result, Exception):
+                        logger.error(f"❌ Batched metadata request failed: {result}")
+                        continue
+                    batch_results.update(result)
+                misses = self.save_batch_metadata(misses, batch_results)
+
+            parsed = []
+            results = self.gather(self.afetch_metadata, misses)
+            for playlist, result in zip(misses, results):
+                if isinstance(result, Exception):
+                    logger.error(
+                        f"❌ Failed to generate data for video {playlist.title}: {result}"
+                    )
+                    continue
+                content, metadata = result
+                self.cache_metadata(
+                    self.playlist_cache_key(playlist), content, metadata
+                )
+                logger.info(f"🎬 Generating data for video {playlist.title}")
+                parsed.append((playlist, metadata))
+
+            self.save_metadata_batch(parsed)
+
+        LLMResponse.objects.evict()
+
+
+def ingest(
+    source: PlaylistSource, full_scan: bool, concurrency: int, quota: QuotaBudget
+):
+    playlist_manager = None
+    try:
+        if concurrency > 1:
+            playlist_manager = AsyncPlaylistManager(
+                playlist_id=source.playlist_id, concurrency=concurrency, quota=quota
+            )
+        else:
+            playlist_manager = PlaylistManager(
+                playlist_id=source.playlist_id, quota=quota
+            )
+        playlist_manager.generate_playlist(full_scan=full_scan)
+        playlist_manager.harvest_comments()
+        playlist_manager.generate()
+    except QuotaExceeded:
+        # Not the source's fault, its scan resumes from the checkpoint
+        raise
+    except Exception as e:
+        PlaylistSource.objects.filter(pk=source.pk).update(last_error=str(e))
+        raise
+    finally:
+        if playlist_manager is not None:
+            playlist_manager.close()
+        quota.flush()
+        # Every worker thread opens its own database connection
+        connection.close()
+
+
+def run(full_scan=False, concurrency=None, workers=None, quota_limit=0):
+    """
+    Ingests every active playlist source, the stalest first. Sources whose
+    last full scan is older than FULL_SCAN_INTERVAL_DAYS get a full scan.
+    ``quota_limit`` caps the YouTube units this run may spend; scans that
+    run out pause at their checkpoint and resume on the next run.
+    """
+    concurrency = int(concurrency or env.int("INGEST_CONCURRENCY", default=0))
+    workers = int(workers or env.int("INGEST_WORKERS", default=4))
+    quota = QuotaBudget(env.int("YOUTUBE_QUOTA_BUDGET", default=10_000), quota_limit)
+    if quota.remaining() == 0:
+        logger.warning("⛽ Daily YouTube quota budget is used up, skipping this run")
+        return
+
+    playlist_id = env("PLAYLIST_ID", default=None)
+    if playlist_id:
+        PlaylistSource.objects.seed(
+            playlist_id, env("PLAYLIST_LAST_VIDEO_ID", default="")
+        )
+
+    version = DataVersion.objects.current()
+    sources = list(PlaylistSource.objects.stale_first())
+    due = set(
+        PlaylistSource.objects.full_scan_due(
+            timedelta(days=env.int("FULL_SCAN_INTERVAL_DAYS", default=7))
+        ).values_list("pk", flat=True)
+    )
+    logger.info(
+        f"🗂️ Ingesting {len(sources)} playlists "
+        f"({len(sources) if full_scan else len(due)} full scans) with "
+        f"{workers} workers and {quota_limit or quota.remaining() or 'unlimited'} quota units"
+    )
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as pool:
+        futures = {
+            pool.submit(
+                ingest, source, full_scan or source.pk in due, concurrency, quota
+            ): source
+            for source in sources
+        }
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                future.result()
+                logger.info(f"✅ Ingested 📂 Playlist ID: {source.playlist_id}")
+            except QuotaExceeded as e:
+                logger.warning(
+                    f"⛽ {e}, 📂 Playlist ID: {source.playlist_id} resumes next run"
+                )
+                # The quota is shared, the sources not started yet would fail too
+                for pending in futures:
+                    pending.cancel()
+            except Exception as e:
+                logger.error(
+                    f"❌ Failed to ingest 📂 Playlist ID: {source.playlist_id}: {e}"
+                )
 
-def run(full_scan=False):
-    playlist_manager = PlaylistManager(playlist_id=env("PLAYLIST_ID"))
-    playlist_manager.generate_playlist(full_scan=full_scan)
-    playlist_manager.generate()
+    logger.info(f"⛽ Used {quota.spent} YouTube quota units")
+    # Writes bump the version themselves, so runs that changed nothing keep the cache
+    if DataVersion.objects.current() != version:
+        logger.info("🔄 Data version bumped, cached pages will refresh")
@@ -1,11 +1,20 @@
 import functools
+import logging
+import math
 import time
 import traceback
 
 import schedule
 
+from core.models import QuotaUsage
+from fuminsho.settings import env
 from .main import run as task
 
+logger = logging.getLogger("fuminsho")
+
+# Ingestion runs once per slot, spreading the day's quota over the slots left
+SLOT_MINUTES = 60
+
 
 def catch_exceptions(cancel_on_failure=False):
     def catch_exceptions_decorator(job_func):
@@ -24,21 +33,35 @@ def catch_exceptions(cancel_on_failure=False):
     return catch_exceptions_decorator
 
 
-@catch_exceptions()
-def safe_task():
-    task()
+def slot_budget() -> int:
+    """
+    Units for this slot: what is left of today's budget split evenly over
+    the slots left until the quota resets, so a long full scan or a burst
+    of new videos can't starve the rest of the day. Units a slot leaves
+    unused roll over to the next ones.
+    """
+    daily = env.int("YOUTUBE_QUOTA_BUDGET", default=10_000)
+    if not daily:
+        return 0
+    remaining = max(daily - QuotaUsage.objects.used(), 0)
+    slots_left = math.ceil(QuotaUsage.objects.seconds_left() / (SLOT_MINUTES * 60))
+    return remaining // max(slots_left, 1)
 
 
 @catch_exceptions()
-def safe_task_full_scan():
-    task(full_scan=True)
+def safe_task():
+    units = slot_budget()
+    if env.int("YOUTUBE_QUOTA_BUDGET", default=10_000) and not units:
+        logger.info("⛽ No YouTube quota left for this slot, waiting for the reset")
+        return
+    task(quota_limit=units)
 
 
-schedule.every().day.at("00:00", "Asia/Tehran").do(safe_task)
-schedule.every().saturday.at("06:00", "Asia/Tehran").do(safe_task_full_scan)
+schedule.every(SLOT_MINUTES).minutes.do(safe_task)
 
 
 def run():
+    safe_task()
     while True:
         schedule.run_pending()
         time.sleep(1)
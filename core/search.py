@@ -0,0 +1,274 @@
+import logging
+import re
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Q
+from django.urls import reverse
+
+from core.models import Genre, Playlist, Song
+
+logger = logging.getLogger(__name__)
+
+KINDS = ["playlist", "song", "genre"]
+MAX_RESULTS = 100
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# PostgreSQL: weighted tsvector per model, backed by a GIN expression index
+SEARCH_CONFIG = "simple"
+SEARCH_FIELDS = {
+    "playlist": {"A": ["title"], "B": ["description", "helpful_comment"]},
+    "song": {"A": ["title", "artist"]},
+    "genre": {"A": ["name"]},
+}
+SEARCH_MODELS = {"playlist": Playlist, "song": Song, "genre": Genre}
+
+# SQLite: one FTS5 table for every model, kept in sync by triggers. The rowid
+# packs the primary key and the kind, so updates and deletes are rowid lookups.
+FTS_TABLE = "core_search"
+FTS_SOURCES = {
+    "playlist": {
+        "table": "core_playlist",
+        "columns": ["title", "description", "helpful_comment"],
+        "title": "{row}.title",
+        "body": "coalesce({row}.description, '') || ' ' || coalesce({row}.helpful_comment, '')",
+    },
+    "song": {
+        "table": "core_song",
+        "columns": ["title", "artist"],
+        "title": "coalesce({row}.title, '')",
+        "body": "coalesce({row}.artist, '')",
+    },
+    "genre": {
+        "table": "core_genre",
+        "columns": ["name"],
+        "title": "{row}.name",
+        "body": "''",
+    },
+}
+# bm25() weights for the title and body columns, as FTS5's rank function
+FTS_WEIGHTS = (10.0, 1.0)
+FTS_RANK = f"bm25({', '.join(map(str, FTS_WEIGHTS))})"
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    kind: str
+    title: str
+    subtitle: str
+    url: str
+    rank: float
+
+
+def search_vector(kind: str) -> SearchVector:
+    vector = None
+    for weight, fields in SEARCH_FIELDS[kind].items():
+        part = SearchVector(*fields, weight=weight, config=SEARCH_CONFIG)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def search_tokens(query: str) -> List[str]:
+    return TOKEN_PATTERN.findall(query.lower())[:10]
+
+
+def search(
+    query: str, kinds: Optional[Iterable[str]] = None, limit: int = 20
+) -> List[SearchResult]:
+    """Ranked matches for every word of ``query``, as prefixes."""
+    tokens = search_tokens(query)
+    kinds = [kind for kind in (kinds or KINDS) if kind in KINDS]
+    limit = max(1, min(limit, MAX_RESULTS))
+    if not tokens or not kinds:
+        return []
+
+    if connection.vendor == "postgresql":
+        return postgres_search(tokens, kinds, limit)
+    if connection.vendor == "sqlite":
+        return sqlite_search(tokens, kinds, limit)
+    return fallback_search(tokens, kinds, limit)
+
+
+def postgres_search(tokens: List[str], kinds: List[str], limit: int):
+    query = SearchQuery(
+        " & ".join(f"{token}:*" for token in tokens),
+        config=SEARCH_CONFIG,
+        search_type="raw",
+    )
+    results = []
+    for kind in kinds:
+        vector = search_vector(kind)
+        matches = (
+            search_queryset(kind)
+            .annotate(search=vector, rank=SearchRank(vector, query))
+            .filter(search=query)
+            .order_by("-rank")[:limit]
+        )
+        results.extend(to_result(kind, match, match.rank) for match in matches)
+    return sorted(results, key=lambda result: -result.rank)[:limit]
+
+
+def sqlite_search(tokens: List[str], kinds: List[str], limit: int):
+    match = " ".join(f'"{token}"*' for token in tokens)
+    codes = ", ".join(str(KINDS.index(kind)) for kind in kinds)
+    # Removed videos stay indexed, they are left out before the LIMIT
+    removed = (
+        f"SELECT id * {len(KINDS)} + {KINDS.index('playlist')} FROM core_playlist "
+        f"WHERE removed_at IS NOT NULL"
+    )
+    with connection.cursor() as cursor:
+        # ORDER BY rank with a LIMIT lets FTS5 keep only the best matches
+        # while it scores them, however broad the query
+        cursor.execute(
+            f"SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"AND rank MATCH %s AND rowid %% {len(KINDS)} IN ({codes}) "
+            f"AND rowid NOT IN ({removed}) ORDER BY rank LIMIT %s",
+            [match, FTS_RANK, limit],
+        )
+        rows = cursor.fetchall()
+
+    ids = {kind: [] for kind in KINDS}
+    for row_id, _ in rows:
+        ids[KINDS[row_id % len(KINDS)]].append(row_id // len(KINDS))
+    objects = {
+        kind: search_queryset(kind).in_bulk(pks) for kind, pks in ids.items() if pks
+    }
+
+    results = []
+    for row_id, score in rows:
+        kind = KINDS[row_id % len(KINDS)]
+        match = objects[kind].get(row_id // len(KINDS))
+        if match is not None:
+            results.append(to_result(kind, match, -score))
+    return results
+
+
+def fallback_search(tokens: List[str], kinds: List[str], limit: int):
+    results = []
+    for kind in kinds:
+        condition = Q()
+        for token in tokens:
+            token_condition = Q()
+            for fields in SEARCH_FIELDS[kind].values():
+                for field in fields:
+                    token_condition |= Q(**{f"{field}__icontains": token})
+            condition &= token_condition
+        matches = search_queryset(kind).filter(condition)[:limit]
+        results.extend(to_result(kind, match, 0.0) for match in matches)
+    return results[:limit]
+
+
+def search_queryset(kind: str):
+    """The rows of ``kind`` that can be found, removed videos left out."""
+    if kind == "playlist":
+        return Playlist.objects.listed()
+    return SEARCH_MODELS[kind].objects.all()
+
+
+def to_result(kind: str, obj, rank: float) -> SearchResult:
+    if kind == "playlist":
+        return SearchResult(
+            kind, obj.title, obj.video_owner_channel_title, obj.link, rank
+        )
+    if kind == "song":
+        url = reverse("song", args=[obj.slug]) if obj.slug else ""
+        return SearchResult(kind, obj.title or "", obj.artist or "", url, rank)
+    return SearchResult(kind, obj.name, "", reverse("genre", args=[obj.slug]), rank)
+
+
+def create_index(schema_editor, apps=None):
+    """Creates the search index for the current database, used by migrations."""
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        for kind, model in SEARCH_MODELS.items():
+            if apps is not None:
+                model = apps.get_model("core", model.__name__)
+            schema_editor.add_index(model, search_index(kind))
+    elif vendor == "sqlite":
+        for statement in sqlite_schema():
+            schema_editor.execute(statement)
+        rebuild_index(schema_editor.connection)
+
+
+def restore_triggers(schema_editor, apps=None):
+    """
+    Recreates the SQLite triggers and refills the index. SQLite migrations
+    that rebuild a table (adding a NOT NULL column does) drop its triggers.
+    """
+    if schema_editor.connection.vendor == "sqlite":
+        for statement in sqlite_schema():
+            schema_editor.execute(statement)
+        rebuild_index(schema_editor.connection)
+
+
+def drop_index(schema_editor, apps=None):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        for kind, model in SEARCH_MODELS.items():
+            if apps is not None:
+                model = apps.get_model("core", model.__name__)
+            schema_editor.remove_index(model, search_index(kind))
+    elif vendor == "sqlite":
+        for kind in KINDS:
+            for action in ("ai", "au", "ad"):
+                schema_editor.execute(
+                    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{kind}_{action}"
+                )
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def search_index(kind: str) -> GinIndex:
+    return GinIndex(search_vector(kind), name=f"core_{kind}_search_gin")
+
+
+def sqlite_schema() -> List[str]:
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"title, body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    ]
+    for kind, source in FTS_SOURCES.items():
+        code = KINDS.index(kind)
+        insert = (
+            f"INSERT OR REPLACE INTO {FTS_TABLE}(rowid, title, body) VALUES "
+            f"(new.id * {len(KINDS)} + {code}, {source['title'].format(row='new')}, "
+            f"{source['body'].format(row='new')});"
+        )
+        delete = (
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id * {len(KINDS)} + {code};"
+        )
+        columns = ", ".join(source["columns"])
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_{kind}_ai AFTER INSERT ON "
+            f"{source['table']} BEGIN {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_{kind}_au AFTER UPDATE OF "
+            f"{columns} ON {source['table']} BEGIN {delete} {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_{kind}_ad AFTER DELETE ON "
+            f"{source['table']} BEGIN {delete} END",
+        ]
+    return statements
+
+
+def rebuild_index(db=connection) -> int:
+    """Refills the SQLite FTS5 table from scratch. A no-op on other databases."""
+    if db.vendor != "sqlite":
+        return 0
+
+    with db.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        for kind, source in FTS_SOURCES.items():
+            table = source["table"]
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}(rowid, title, body) "
+                f"SELECT id * {len(KINDS)} + {KINDS.index(kind)}, "
+                f"{source['title'].format(row=table)}, {source['body'].format(row=table)} "
+                f"FROM {table}"
+            )
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT count(*) FROM {FTS_TABLE}")
+        indexed = cursor.fetchone()[0]
+
+    logger.info(f"🔎 Search index rebuilt with {indexed} entries")
+    return indexed
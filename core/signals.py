@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save
+
+from core.models import (
+    DataVersion,
+    Genre,
+    Playlist,
+    PlaylistGenre,
+    PlaylistSong,
+    Song,
+)
+
+CATALOG_MODELS = [Genre, Playlist, PlaylistGenre, PlaylistSong, Song]
+
+
+def bump_data_version(sender, **kwargs):
+    """
+    Single-object edits (admin, shell) invalidate the cached pages. Bulk
+    writes skip signals and bump the version themselves.
+    """
+    if not kwargs.get("raw"):
+        DataVersion.objects.bump_on_commit()
+
+
+# Only the catalog models, so every other model keeps Django's fast deletes
+for model in CATALOG_MODELS:
+    post_save.connect(bump_data_version, sender=model)
+    post_delete.connect(bump_data_version, sender=model)
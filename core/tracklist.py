@@ -0,0 +1,113 @@
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+TIMESTAMP = r"(?:\d{1,2}:)?\d{1,2}:\d{2}"
+NUMBERING = r"(?:\d{1,3}[.)]|#\d{1,3})"
+
+# "00:00 Artist - Title", "[00:00] Artist - Title", "01. 00:00 - Artist - Title"
+LEADING_TIMESTAMP_PATTERN = re.compile(
+    rf"^(?:{NUMBERING}\s*)?[\[(]?(?P<timestamp>{TIMESTAMP})[\])]?\s*[-–—:|.]?\s+(?P<rest>.+)$"
+)
+# "Artist - Title 00:00", "01. Artist - Title (00:00)"
+TRAILING_TIMESTAMP_PATTERN = re.compile(
+    rf"^(?:{NUMBERING}\s*)?(?P<rest>.+?)\s*[-–—|]?\s+[\[(]?(?P<timestamp>{TIMESTAMP})[\])]?$"
+)
+# "01. Artist - Title"
+NUMBERED_PATTERN = re.compile(rf"^{NUMBERING}\s+(?P<rest>.+)$")
+ARTIST_TITLE_PATTERN = re.compile(r"^(?P<artist>.+?)\s+[-–—]\s+(?P<title>.+)$")
+TITLE_BY_ARTIST_PATTERN = re.compile(r"^(?P<title>.+?)\s+by\s+(?P<artist>.+)$", re.I)
+QUOTES = "\"'“”‘’「」"
+
+# A bare timestamp as the LLM returns it: "1:02:03", "[03:10]"
+OFFSET_PATTERN = re.compile(rf"^[\[(]?(?P<timestamp>{TIMESTAMP})[\])]?$")
+
+MIN_TRACKS = 3
+MAX_LINE_LENGTH = 200
+
+
+@dataclass(frozen=True)
+class Track:
+    artist: Optional[str]
+    title: Optional[str]
+    timestamp: Optional[str]
+
+
+@dataclass(frozen=True)
+class Tracklist:
+    tracks: List[Track]
+    confidence: float
+
+
+def timestamp_to_seconds(timestamp: str) -> int:
+    seconds = 0
+    for part in timestamp.split(":"):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def parse_offset(timestamp: Optional[str]) -> Optional[int]:
+    """Seconds into the video of a track's timestamp, None if it isn't one."""
+    match = OFFSET_PATTERN.match((timestamp or "").strip())
+    return timestamp_to_seconds(match.group("timestamp")) if match else None
+
+
+def parse_artist_title(text: str) -> tuple[Optional[str], Optional[str]]:
+    text = text.strip().strip(QUOTES).strip()
+    match = ARTIST_TITLE_PATTERN.match(text) or TITLE_BY_ARTIST_PATTERN.match(text)
+    if match:
+        artist = match.group("artist").strip().strip(QUOTES).strip()
+        title = match.group("title").strip().strip(QUOTES).strip()
+        return artist or None, title or None
+    return None, text or None
+
+
+def parse_line(line: str) -> Optional[Track]:
+    line = line.strip()
+    if not line or len(line) > MAX_LINE_LENGTH:
+        return None
+
+    match = (
+        LEADING_TIMESTAMP_PATTERN.match(line)
+        or TRAILING_TIMESTAMP_PATTERN.match(line)
+        or NUMBERED_PATTERN.match(line)
+    )
+    if not match:
+        return None
+
+    artist, title = parse_artist_title(match.group("rest"))
+    if not title:
+        return None
+
+    timestamp = match.groupdict().get("timestamp")
+    return Track(artist=artist, title=title, timestamp=timestamp)
+
+
+def score_tracks(tracks: List[Track]) -> float:
+    """
+    Rates how likely the parsed lines are a real tracklist, from 0 to 1.
+    Rewards longer lists, lines split into artist and title, and
+    timestamps that only move forward.
+    """
+    if len(tracks) < MIN_TRACKS:
+        return 0.0
+
+    size = min(len(tracks) / 6, 1.0)
+    with_artist = sum(1 for track in tracks if track.artist) / len(tracks)
+
+    seconds = [
+        timestamp_to_seconds(track.timestamp) for track in tracks if track.timestamp
+    ]
+    if len(seconds) >= 2:
+        pairs = list(zip(seconds, seconds[1:]))
+        ordered = sum(1 for before, after in pairs if after > before) / len(pairs)
+        ordered *= len(seconds) / len(tracks)
+    else:
+        ordered = 0.5
+
+    return round(0.3 * size + 0.35 * with_artist + 0.35 * ordered, 2)
+
+
+def extract_tracklist(text: Optional[str]) -> Tracklist:
+    tracks = [track for track in map(parse_line, (text or "").splitlines()) if track]
+    return Tracklist(tracks=tracks, confidence=score_tracks(tracks))
@@ -6,6 +6,8 @@ from core.views import (
     IndexView,
     LogsView,
     PlaylistListView,
+    PlaylistRowsView,
+    SearchView,
     SongDetailView,
     SongListView,
 )
@@ -13,9 +15,11 @@ from core.views import (
 urlpatterns = [
     path("", IndexView.as_view(), name="index"),
     path("playlists/", PlaylistListView.as_view(), name="playlists"),
+    path("playlists/rows/", PlaylistRowsView.as_view(), name="playlist_rows"),
     path("songs/", SongListView.as_view(), name="songs"),
     path("songs/<slug:slug>/", SongDetailView.as_view(), name="song"),
     path("genres/", GenreListView.as_view(), name="genres"),
     path("genres/<slug:slug>/", GenreDetailView.as_view(), name="genre"),
+    path("search/", SearchView.as_view(), name="search"),
     path("logs/", LogsView.as_view(), name="logs"),
 ]
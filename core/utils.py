@@ -1,19 +1,147 @@
 import logging
+import os
+import queue
+import threading
+import time
+from typing import List, Tuple
 
 import httpx
 
+# Discord rejects messages with more characters than this
+MESSAGE_LIMIT = 2000
+
 
 class DiscordWebhookHandler(logging.Handler):
-    def __init__(self, webhook_url):
+    """
+    Sends log records to a Discord webhook without blocking the caller.
+
+    ``emit`` only formats the record and puts it on a queue, the way
+    ``logging.handlers.QueueHandler`` does. A background thread, started on
+    the first record in each process, drains the queue like a
+    ``QueueListener``. It joins the records collected over ``interval``
+    seconds into as few messages as fit in MESSAGE_LIMIT characters, and
+    posts them over one pooled connection while honouring Discord's rate
+    limits. ``close`` (called by ``logging.shutdown`` at exit) sends what is
+    still queued.
+    """
+
+    def __init__(
+        self,
+        webhook_url,
+        interval: float = 2.0,
+        capacity: int = 10_000,
+        close_timeout: float = 10.0,
+    ):
         super().__init__()
         self.webhook_url = webhook_url
+        self.interval = interval
+        self.capacity = capacity
+        self.close_timeout = close_timeout
+        self.queue = None
+        self.thread = None
+        self.pid = None
+        self.dropped = 0
 
     def emit(self, record):
-        log_entry = self.format(record)
         try:
-            httpx.post(self.webhook_url, json={"content": log_entry})
-        except Exception as e:
-            print(f"Failed to send log to Discord: {e}")
+            message = self.format(record)
+            self.start()
+            self.queue.put_nowait(message)
+        except queue.Full:
+            # Never block the caller, Discord is only a convenience copy
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def start(self):
+        """Starts the sender thread, again after a fork as threads don't survive it."""
+        if self.thread is not None and self.pid == os.getpid():
+            return
+        self.pid = os.getpid()
+        self.queue = queue.Queue(self.capacity)
+        self.thread = threading.Thread(
+            target=self.run, name="discord-webhook", daemon=True
+        )
+        self.thread.start()
+
+    def run(self):
+        with httpx.Client(timeout=10) as client:
+            closing = False
+            while not closing:
+                records, closing = self.collect()
+                for content in self.pack(records):
+                    self.send(client, content)
+
+    def collect(self) -> Tuple[List[str], bool]:
+        """Waits for a record, then gathers more for up to ``interval`` seconds."""
+        records, size, deadline = [], 0, None
+        while size < MESSAGE_LIMIT:
+            timeout = None if deadline is None else deadline - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                break
+            try:
+                record = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if record is None:
+                return records, True
+            records.append(record)
+            size += len(record) + 1
+            deadline = deadline or time.monotonic() + self.interval
+        return records, False
+
+    def pack(self, records: List[str]) -> List[str]:
+        """Joins records into messages of at most MESSAGE_LIMIT characters."""
+        if self.dropped:
+            records = [f"⚠️ Dropped {self.dropped} log records"] + records
+            self.dropped = 0
+
+        messages = []
+        for record in records:
+            # Split records that are too long on their own
+            for start in range(0, len(record), MESSAGE_LIMIT):
+                part = record[start : start + MESSAGE_LIMIT]
+                if messages and len(messages[-1]) + len(part) < MESSAGE_LIMIT:
+                    messages[-1] += "\n" + part
+                else:
+                    messages.append(part)
+        return messages
+
+    def send(self, client: httpx.Client, content: str, attempts: int = 5):
+        for _ in range(attempts):
+            try:
+                response = client.post(self.webhook_url, json={"content": content})
+            except httpx.HTTPError as e:
+                print(f"Failed to send log to Discord: {e}")
+                return
+
+            if response.status_code == 429:
+                time.sleep(self.retry_after(response))
+                continue
+            if response.is_error:
+                print(f"Failed to send log to Discord: {response.status_code}")
+                return
+
+            # Wait for the bucket to refill instead of running into a 429
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                time.sleep(float(response.headers.get("X-RateLimit-Reset-After", 0)))
+            return
+        print("Failed to send log to Discord: still rate limited")
+
+    def retry_after(self, response: httpx.Response) -> float:
+        try:
+            return float(response.json()["retry_after"])
+        except (ValueError, KeyError, TypeError):
+            return float(response.headers.get("Retry-After", 1))
+
+    def close(self):
+        if self.thread and self.pid == os.getpid() and self.thread.is_alive():
+            try:
+                self.queue.put(None, timeout=self.close_timeout)
+                self.thread.join(self.close_timeout)
+            except queue.Full:
+                pass
+        super().close()
 
 
 def generate_youtube_link(video_id):
@@ -1,16 +1,19 @@
+import hashlib
 import logging
-import os
 from typing import Optional
 
-from django.core.cache import cache
-from django.db.models import Count
-from django.http import HttpResponse
-from django.shortcuts import render, get_object_or_404
+from django.core.cache import caches
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import redirect, render, get_object_or_404
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.decorators.cache import cache_control
 
-from core.models import Playlist, Genre, Song
+from core.forms import LogFilterForm, PlaylistFilterForm
+from core.logs import LogStore
+from core.models import DataVersion, Playlist, Genre, Song, SongAlias
+from core.pagination import KeysetPaginator
+from core.search import KINDS, search
 from fuminsho import settings
 
 logger = logging.getLogger(__name__)
@@ -19,10 +22,25 @@ logger = logging.getLogger(__name__)
 class BaseView(View):
     template_name: str = None
     cache_timeout: int = 600
+    # Serve GET responses from the "pages" cache until the data version changes
+    cache_pages: bool = True
 
     @method_decorator(cache_control(max_age=600))
-    def dispatch(self, *args, **kwargs):
-        return super().dispatch(*args, **kwargs)
+    def dispatch(self, request, *args, **kwargs):
+        if not self.cache_pages or request.method != "GET":
+            return super().dispatch(request, *args, **kwargs)
+
+        key = self.page_cache_key(request)
+        response = caches["pages"].get(key)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code == 200:
+                caches["pages"].set(key, response)
+        return response
+
+    def page_cache_key(self, request) -> str:
+        url = hashlib.sha256(request.build_absolute_uri().encode()).hexdigest()
+        return f"page:{DataVersion.objects.current()}:{url}"
 
     def render(self, context: Optional[dict] = None) -> HttpResponse:
         return render(self.request, self.template_name, context)
@@ -32,48 +50,65 @@ class IndexView(BaseView):
     template_name = "pages/index.html"
 
     def get(self, request):
-        stats = cache.get("index_stats")
-        if stats is None:
-            stats = {
-                "playlists_count": Playlist.objects.count(),
-                "genres_count": Genre.objects.count(),
-                "songs_count": Song.objects.count(),
-            }
-            cache.set("index_stats", stats, 24 * 60 * 60)  # Cache for 1 day
+        stats = {
+            "playlists_count": Playlist.objects.listed().count(),
+            "genres_count": Genre.objects.count(),
+            "songs_count": Song.objects.count(),
+        }
 
         context = {
             "stats": stats,
-            "recent_playlists": Playlist.objects.values(
+            "recent_playlists": Playlist.objects.listed().values(
                 "title", "link", "thumbnails"
-            ).values("title", "link", "thumbnails")[:2],
+            )[:2],
         }
         return self.render(context)
 
 
 class PlaylistListView(BaseView):
     template_name = "pages/playlists.html"
+    page_size = 50
 
     def get(self, request):
-        is_favorite = request.GET.get("favorite")
-        all_playlists = Playlist.objects.prefetch_related(
-            "genres", "songs", "playlistsong_set", "playlistsong_set__song"
-        ).select_related()
-        if is_favorite:
-            all_playlists = all_playlists.filter(is_favorite=True)
-
-        context = {"all_playlists": all_playlists}
+        form = PlaylistFilterForm(request.GET)
+        playlists = form.filter(
+            Playlist.objects.listed().prefetch_related(
+                "genres", "playlistsong_set__song"
+            )
+        )
+        paginator = KeysetPaginator(playlists, form.ordering, self.page_size)
+        cursor = form.cleaned_data.get("cursor")
+        page, next_cursor = paginator.page(cursor)
+
+        context = {
+            "form": form,
+            "playlists": page,
+            "next_cursor": next_cursor,
+        }
+        if not cursor:
+            context["total"] = playlists.count()
+            context["genres"] = Genre.objects.order_by("name").values("name", "slug")
         return self.render(context)
 
 
+class PlaylistRowsView(PlaylistListView):
+    """HTML fragment with the next page of rows, for lazy loading."""
+
+    template_name = "partials/playlist_rows.html"
+
+    def render(self, context: Optional[dict] = None) -> HttpResponse:
+        response = super().render(context)
+        response["X-Next-Cursor"] = context["next_cursor"] or ""
+        if "total" in context:
+            response["X-Total-Count"] = context["total"]
+        return response
+
+
 class SongListView(BaseView):
     template_name = "pages/songs.html"
 
     def get(self, request):
-        all_songs = (
-            Song.objects.annotate(count_playlists=Count("playlist"))
-            .select_related()
-            .order_by("-count_playlists")
-        )
+        all_songs = Song.objects.order_by("-playlist_count")
 
         context = {"all_songs": all_songs}
         return self.render(context)
@@ -83,10 +118,20 @@ class SongDetailView(BaseView):
     template_name = "pages/song.html"
 
     def get(self, request, slug):
-        song = get_object_or_404(Song.objects.select_related(), slug=slug)
-        playlists = song.playlist_set.prefetch_related(
-            "genres", "songs", "playlistsong_set", "playlistsong_set__song"
-        ).select_related()
+        song = Song.objects.filter(slug=slug).first()
+        if song is None:
+            # Merged into another song, see Song.objects.merge
+            alias = get_object_or_404(
+                SongAlias.objects.select_related("song"), slug=slug
+            )
+            return redirect("song", alias.song.slug, permanent=True)
+        playlists = (
+            song.playlist_set.listed()
+            .prefetch_related(
+                "genres", "songs", "playlistsong_set", "playlistsong_set__song"
+            )
+            .select_related()
+        )
 
         context = {
             "playlists": playlists,
@@ -99,12 +144,7 @@ class GenreListView(BaseView):
     template_name = "pages/genres.html"
 
     def get(self, request):
-        genres = (
-            Genre.objects.annotate(count_playlists=Count("playlist"))
-            .select_related()
-            .order_by("-count_playlists")
-            .all()
-        )
+        genres = Genre.objects.order_by("-playlist_count")
         context = {"genres": genres}
         return self.render(context)
 
@@ -114,8 +154,12 @@ class GenreDetailView(BaseView):
 
     def get(self, request, slug):
         genre = get_object_or_404(Genre, slug=slug)
-        playlists = Playlist.objects.filter(genres=genre).prefetch_related(
-            "genres", "songs", "playlistsong_set", "playlistsong_set__song"
+        playlists = (
+            Playlist.objects.listed()
+            .filter(genres=genre)
+            .prefetch_related(
+                "genres", "songs", "playlistsong_set", "playlistsong_set__song"
+            )
         )
 
         context = {
@@ -125,20 +169,72 @@ class GenreDetailView(BaseView):
         return self.render(context)
 
 
+class SearchView(BaseView):
+    template_name = "pages/search.html"
+
+    def get(self, request):
+        query = request.GET.get("q", "").strip()
+        kind = request.GET.get("type") or None
+        results = search(query, kinds=[kind] if kind else None, limit=50)
+
+        context = {
+            "query": query,
+            "kind": kind,
+            "kinds": KINDS,
+            "results": results,
+        }
+        return self.render(context)
+
+
 class LogsView(BaseView):
     template_name = "pages/logs.html"
+    cache_pages = False
+    page_size = 200
+    stream_timeout = 60
 
     def get(self, request):
-        log_file_path = os.path.join(settings.BASE_DIR, "logs", "log")
-        try:
-            with open(log_file_path, "r", encoding="utf-8") as log_file:
-                log_content = log_file.read()[-200_000:]
-
-            context = {"log_content": log_content}
-            return self.render(context)
-        except FileNotFoundError:
-            logger.error(f"Log file not found at {log_file_path}")
+        logs = LogStore(settings.LOGGING["handlers"]["file"]["filename"])
+        if not logs.exists():
+            logger.error(f"Log file not found at {logs.path}")
             return HttpResponse("Log file not found.", status=404)
+
+        form = LogFilterForm(request.GET)
+        form.is_valid()
+        filters = form.cleaned_data
+        try:
+            if filters.get("stream"):
+                return self.stream(logs, filters.get("level"))
+
+            entries, older = logs.query(
+                level=filters.get("level"),
+                since=filters.get("since"),
+                until=filters.get("until"),
+                before=filters.get("before"),
+                limit=filters.get("limit") or self.page_size,
+            )
         except Exception as e:
             logger.error(f"Error reading log file: {str(e)}")
             return HttpResponse("Error reading log file.", status=500)
+
+        context = {
+            "form": form,
+            "entries": entries,
+            "older": older,
+            "end": entries[-1].end if entries else None,
+        }
+        return self.render(context)
+
+    def stream(self, logs: LogStore, level: Optional[str]):
+        """Server-sent events of new entries; EventSource resumes from Last-Event-ID."""
+        last_event_id = self.request.headers.get("Last-Event-ID", "")
+        offset = int(last_event_id) if last_event_id.isdigit() else None
+
+        def events():
+            for entry in logs.follow(offset, level, timeout=self.stream_timeout):
+                data = "\n".join(f"data: {line}" for line in entry.text.splitlines())
+                yield f"id: {entry.end}\nevent: {entry.level}\n{data}\n\n"
+
+        response = StreamingHttpResponse(events(), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
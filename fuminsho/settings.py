@@ -11,6 +11,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import logging
+import sys
+import tempfile
 from pathlib import Path
 
 import environ
@@ -118,6 +120,9 @@ else:
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db" / "db.sqlite3",
+            # Ingestion workers write concurrently; take the write lock up
+            # front and wait for it instead of failing with "database is locked"
+            "OPTIONS": {"transaction_mode": "IMMEDIATE", "timeout": 20},
         }
     }
 
@@ -164,6 +169,15 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Logging
+# https://docs.djangoproject.com/en/5.1/topics/logging/
+
+# Tests log into the temporary directory instead of the real log
+LOG_DIR = BASE_DIR / "logs"
+if sys.argv[1:2] == ["test"]:
+    LOG_DIR = Path(tempfile.gettempdir()) / "fuminsho-test-logs"
+    LOG_DIR.mkdir(exist_ok=True)
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -176,14 +190,20 @@ LOGGING = {
             "format": "{levelname} {message}",
             "style": "{",
         },
+        "json": {
+            "()": "core.logs.JSONFormatter",
+        },
     },
     "handlers": {
         "file": {
             "level": "DEBUG",
-            "class": "logging.FileHandler",
-            "filename": BASE_DIR / "logs" / "log",
-            "formatter": "simple",
-            "encoding": "utf-8",
+            "class": "core.logs.SegmentedFileHandler",
+            "filename": LOG_DIR / "log",
+            "formatter": "json",
+            "max_bytes": env.int("LOG_MAX_BYTES", default=10 * 1024 * 1024),
+            "max_age": env.int("LOG_MAX_AGE", default=24 * 60 * 60),
+            "backup_count": env.int("LOG_BACKUP_COUNT", default=30),
+            "compress": env.bool("LOG_COMPRESS", default=True),
         },
     },
     "loggers": {
@@ -210,6 +230,41 @@ if discord_webhook_url:
     )
     LOGGING["loggers"]["fuminsho"]["handlers"].append("discord")
 
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # ETag-keyed YouTube Data API responses, reused with If-None-Match
+    "youtube": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache" / "youtube",
+        "TIMEOUT": env.int("YOUTUBE_CACHE_TTL", default=7 * 24 * 60 * 60),
+        "OPTIONS": {
+            "MAX_ENTRIES": env.int("YOUTUBE_CACHE_MAX_ENTRIES", default=20_000),
+        },
+    },
+    # Rendered pages, keyed by core.models.DataVersion so they live until the data changes
+    "pages": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "pages",
+        "TIMEOUT": env.int("PAGE_CACHE_TTL", default=7 * 24 * 60 * 60),
+        "OPTIONS": {
+            "MAX_ENTRIES": env.int("PAGE_CACHE_MAX_ENTRIES", default=1000),
+        },
+    },
+}
+
+# OpenRouter response cache (see core.models.LLMResponse)
+# POLICY is one of "lru", "lfu", "fifo" or "none"; MAX_AGE_DAYS = 0 keeps entries forever
+LLM_CACHE = {
+    "POLICY": env("LLM_CACHE_POLICY", default="lru"),
+    "MAX_ENTRIES": env.int("LLM_CACHE_MAX_ENTRIES", default=50_000),
+    "MAX_AGE_DAYS": env.int("LLM_CACHE_MAX_AGE_DAYS", default=0),
+}
+
 # compressor settings
 COMPRESS_ROOT = BASE_DIR / "static"
 COMPRESS_ENABLED = True
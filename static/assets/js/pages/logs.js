@@ -0,0 +1,32 @@
+const liveTail = document.getElementById("live-tail");
+const logEntries = document.getElementById("log-entries");
+
+if (liveTail && logEntries) {
+    let source = null;
+
+    // Stream new entries as server-sent events; EventSource reconnects (and resumes) on its own
+    liveTail.addEventListener("click", () => {
+        if (source) {
+            source.close();
+            source = null;
+            liveTail.textContent = "Live";
+            return;
+        }
+
+        const params = new URLSearchParams({stream: "true"});
+        const level = document.querySelector('#log-filters [name="level"]').value;
+        if (level) params.set("level", level);
+
+        source = new EventSource(`${liveTail.dataset.streamUrl}?${params}`);
+        liveTail.textContent = "Stop";
+
+        const append = (event) => {
+            const follow = window.innerHeight + window.scrollY >= document.body.offsetHeight - 50;
+            logEntries.append(`${event.data}\n`);
+            if (follow) window.scrollTo(0, document.body.scrollHeight);
+        };
+        for (const level of ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]) {
+            source.addEventListener(level, append);
+        }
+    });
+}
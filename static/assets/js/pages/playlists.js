@@ -1,15 +1,102 @@
-if (document.getElementById("table") && typeof simpleDatatables.DataTable !== 'undefined') {
-    const dataTable = new simpleDatatables.DataTable("#table", {
-        columns: [{select: 0, sortable: false},],
-        searchable: true,
-        sortable: true,
-        perPage: 20,
-        perPageSelect: [20, 50, 100],
+const table = document.getElementById("table");
+const filters = document.getElementById("filters");
+const loadMore = document.getElementById("load-more");
+
+if (table && filters && loadMore) {
+    const tbody = table.querySelector("tbody");
+    const loadMoreLink = loadMore.querySelector("a");
+    const shown = document.getElementById("shown");
+    const total = document.getElementById("total");
+    let controller = null;
+    let searchTimeout = null;
+
+    // Query string for the current filters, without empty values
+    const filterParams = () => {
+        const params = new URLSearchParams();
+        for (const [key, value] of new FormData(filters)) {
+            if (value) params.set(key, value);
+        }
+        return params;
+    };
+
+    // Fetch a page of rows; append it when a cursor is given, otherwise replace the table body.
+    // A filter change aborts the request in flight, so rows of the old filters never land.
+    const fetchRows = async (cursor) => {
+        if (cursor && controller) return;
+        if (!cursor) {
+            controller?.abort();
+            loadMoreLink.dataset.cursor = "";
+        }
+        const request = new AbortController();
+        controller = request;
+
+        const params = filterParams();
+        if (cursor) params.set("cursor", cursor);
+
+        try {
+            const response = await fetch(`${table.dataset.rowsUrl}?${params}`, {signal: request.signal});
+            if (!response.ok) return;
+
+            const html = await response.text();
+            if (cursor) {
+                tbody.insertAdjacentHTML("beforeend", html);
+            } else {
+                tbody.innerHTML = html;
+                history.replaceState(null, "", `?${filterParams()}`);
+            }
+
+            const nextCursor = response.headers.get("X-Next-Cursor");
+            loadMoreLink.dataset.cursor = nextCursor || "";
+            loadMore.classList.toggle("hidden", !nextCursor);
+            if (response.headers.has("X-Total-Count")) {
+                total.textContent = response.headers.get("X-Total-Count");
+            }
+            shown.textContent = tbody.querySelectorAll("tr[data-playlist]").length;
+
+            reinitializeModalsAndPopovers();
+        } catch (error) {
+            if (error.name !== "AbortError") throw error;
+        } finally {
+            if (controller === request) controller = null;
+        }
+    };
+
+    // Lazily load the next page when the bottom of the table scrolls into view
+    const observer = new IntersectionObserver((entries) => {
+        if (entries.some((entry) => entry.isIntersecting) && loadMoreLink.dataset.cursor) {
+            fetchRows(loadMoreLink.dataset.cursor);
+        }
+    }, {rootMargin: "400px"});
+    observer.observe(loadMore);
+
+    loadMoreLink.addEventListener("click", (event) => {
+        event.preventDefault();
+        if (loadMoreLink.dataset.cursor) fetchRows(loadMoreLink.dataset.cursor);
     });
 
-    // Attach reinitialization function to table events
-    dataTable.on('datatable.page', reinitializeModalsAndPopovers);
-    dataTable.on('datatable.update', reinitializeModalsAndPopovers);
+    // Live search, debounced so typing doesn't send a request per key
+    filters.addEventListener("input", (event) => {
+        if (event.target.type !== "search") return;
+        clearTimeout(searchTimeout);
+        searchTimeout = setTimeout(() => fetchRows(), 300);
+    });
+    filters.addEventListener("change", (event) => {
+        if (event.target.type !== "search") fetchRows();
+    });
+    filters.addEventListener("submit", (event) => {
+        event.preventDefault();
+        fetchRows();
+    });
+
+    // Keep the current filters when changing the sort order
+    for (const link of table.querySelectorAll("a[data-sort]")) {
+        link.addEventListener("click", (event) => {
+            event.preventDefault();
+            const params = filterParams();
+            params.set("sort", new URL(link.href).searchParams.get("sort"));
+            window.location.search = params.toString();
+        });
+    }
 
     // Initial call to bind modals and popovers on first load
     reinitializeModalsAndPopovers();